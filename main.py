@@ -1,11 +1,60 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 import uvicorn
 from Duolingo.mysite.api import (country, users, follow, super_follow, family_follow, max_follow, language, course,
                                  lesson, exercise, chat, chat_member, message, add_friends, language_progress,
-                                 lesson_complete, achievement, auth)
+                                 lesson_complete, achievement, auth, leaderboard, league)
 from Duolingo.mysite.admin import setup
+from Duolingo.mysite.database.db import async_engine
+from Duolingo.mysite.services.tasks import PeriodicTask
+from Duolingo.mysite.services.hashing import password_hasher
+from Duolingo.mysite.services.tokens import purge_expired_refresh_tokens
+from Duolingo.mysite.services.catalog import refresh_catalog_versions
+from Duolingo.mysite.services.idempotency import purge_expired_idempotency_keys
+from Duolingo.mysite.services.events import xp_history_buffer, activity_buffer
+from Duolingo.mysite.services.ranking import sync_leaderboards
+from Duolingo.mysite.services.leagues import close_previous_league_week
+from Duolingo.mysite.services.streaks import roll_over_streaks
+from Duolingo.mysite.services.reminders import run_streak_reminders
+from Duolingo.mysite.services.suggestions import refresh_suggestions
+from Duolingo.mysite.services.chat_broker import chat_broker
+from Duolingo.mysite.api.idempotency import IdempotencyMiddleware
+from Duolingo.mysite.config import (REFRESH_TOKEN_PURGE_INTERVAL, CATALOG_VERSION_POLL_INTERVAL,
+                                    IDEMPOTENCY_PURGE_INTERVAL, LEADERBOARD_SYNC_INTERVAL,
+                                    LEAGUE_JOB_INTERVAL, STREAK_ROLLOVER_INTERVAL, STREAK_REMINDER_POLL_INTERVAL,
+                                    SUGGESTION_REFRESH_INTERVAL)
 
-duolingo_app = FastAPI(title='Duolingo')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    tasks = [
+        PeriodicTask('purge_refresh_tokens', REFRESH_TOKEN_PURGE_INTERVAL, purge_expired_refresh_tokens,
+                     run_at_start=True),
+        PeriodicTask('catalog_versions', CATALOG_VERSION_POLL_INTERVAL, refresh_catalog_versions,
+                     run_at_start=True),
+        PeriodicTask('purge_idempotency_keys', IDEMPOTENCY_PURGE_INTERVAL, purge_expired_idempotency_keys),
+        PeriodicTask('leaderboard_sync', LEADERBOARD_SYNC_INTERVAL, sync_leaderboards, run_at_start=True),
+        PeriodicTask('close_league_week', LEAGUE_JOB_INTERVAL, close_previous_league_week),
+        PeriodicTask('roll_over_streaks', STREAK_ROLLOVER_INTERVAL, roll_over_streaks, run_at_start=True),
+        PeriodicTask('streak_reminders', STREAK_REMINDER_POLL_INTERVAL, run_streak_reminders),
+        PeriodicTask('friend_suggestions', SUGGESTION_REFRESH_INTERVAL, refresh_suggestions, run_at_start=True),
+    ]
+    buffers = [xp_history_buffer, activity_buffer]
+    for task in tasks + buffers:
+        task.start()
+    chat_broker.start()
+
+    yield
+
+    await chat_broker.stop()
+    for task in tasks + buffers:
+        await task.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+
+
+duolingo_app = FastAPI(title='Duolingo', lifespan=lifespan)
+duolingo_app.add_middleware(IdempotencyMiddleware)
 
 duolingo_app.include_router(country.country_router)
 duolingo_app.include_router(users.user_router)
@@ -24,6 +73,8 @@ duolingo_app.include_router(add_friends.add_friends_router)
 duolingo_app.include_router(language_progress.language_progress_router)
 duolingo_app.include_router(lesson_complete.lesson_completion_router)
 duolingo_app.include_router(auth.auth_router)
+duolingo_app.include_router(leaderboard.leaderboard_router)
+duolingo_app.include_router(league.league_router)
 duolingo_app.setup()
 
 if __name__ == '__main__':
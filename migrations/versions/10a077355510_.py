@@ -0,0 +1,87 @@
+"""empty message
+
+Revision ID: 10a077355510
+Revises: 9ce60d08aca7
+Create Date: 2026-10-18 22:05:12.604118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '10a077355510'
+down_revision: Union[str, Sequence[str], None] = '9ce60d08aca7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PROFILE_CHILD_TABLES = ('streak', 'language_progress', 'user_achievement')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table in PROFILE_CHILD_TABLES:
+        op.execute(f'DROP TRIGGER {table}_profile_version ON {table}')
+    op.execute('DROP FUNCTION bump_profile_version()')
+
+    # Statement-level: a bulk write bumps every affected profile with one UPDATE.
+    # Profiles already written by the current transaction (xmin is our xid) are
+    # skipped, so a lesson completion touching several child tables bumps once.
+    op.execute("""
+        CREATE FUNCTION bump_profile_versions() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE profile SET version = version + 1
+                WHERE id IN (SELECT user_id FROM new_rows)
+                  AND xmin::text::bigint <> txid_current() % 4294967296;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE profile SET version = version + 1
+                WHERE id IN (SELECT user_id FROM old_rows)
+                  AND xmin::text::bigint <> txid_current() % 4294967296;
+            ELSE
+                UPDATE profile SET version = version + 1
+                WHERE id IN (SELECT user_id FROM new_rows UNION SELECT user_id FROM old_rows)
+                  AND xmin::text::bigint <> txid_current() % 4294967296;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    # Transition tables allow only one event per trigger.
+    for table in PROFILE_CHILD_TABLES:
+        op.execute(f'CREATE TRIGGER {table}_profile_version_ins AFTER INSERT ON {table} '
+                   f'REFERENCING NEW TABLE AS new_rows '
+                   f'FOR EACH STATEMENT EXECUTE FUNCTION bump_profile_versions()')
+        op.execute(f'CREATE TRIGGER {table}_profile_version_upd AFTER UPDATE ON {table} '
+                   f'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+                   f'FOR EACH STATEMENT EXECUTE FUNCTION bump_profile_versions()')
+        op.execute(f'CREATE TRIGGER {table}_profile_version_del AFTER DELETE ON {table} '
+                   f'REFERENCING OLD TABLE AS old_rows '
+                   f'FOR EACH STATEMENT EXECUTE FUNCTION bump_profile_versions()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in PROFILE_CHILD_TABLES:
+        for suffix in ('ins', 'upd', 'del'):
+            op.execute(f'DROP TRIGGER {table}_profile_version_{suffix} ON {table}')
+    op.execute('DROP FUNCTION bump_profile_versions()')
+
+    op.execute("""
+        CREATE FUNCTION bump_profile_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                UPDATE profile SET version = version + 1 WHERE id = OLD.user_id;
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.user_id IS DISTINCT FROM OLD.user_id) THEN
+                UPDATE profile SET version = version + 1 WHERE id = NEW.user_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in PROFILE_CHILD_TABLES:
+        op.execute(f'CREATE TRIGGER {table}_profile_version AFTER INSERT OR UPDATE OR DELETE '
+                   f'ON {table} FOR EACH ROW EXECUTE FUNCTION bump_profile_version()')
@@ -0,0 +1,40 @@
+"""empty message
+
+Revision ID: 212e9aea64ba
+Revises: 10a077355510
+Create Date: 2026-10-18 23:40:12.304517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '212e9aea64ba'
+down_revision: Union[str, Sequence[str], None] = '10a077355510'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('league_seat',
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('tier', sa.Integer(), nullable=False),
+    sa.Column('seats', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('week', 'tier')
+    )
+    # Existing cohorts count as full, so later joiners start a fresh one.
+    # 30 is LEAGUE_COHORT_SIZE as configured when this revision was written.
+    op.execute("""
+        INSERT INTO league_seat (week, tier, seats)
+        SELECT week, tier, (max(cohort) + 1) * 30
+        FROM league_membership GROUP BY week, tier
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('league_seat')
@@ -0,0 +1,30 @@
+"""empty message
+
+Revision ID: 340361458f33
+Revises: eb48b6b73f89
+Create Date: 2026-10-18 19:41:05.226318
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '340361458f33'
+down_revision: Union[str, Sequence[str], None] = 'eb48b6b73f89'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_streak_live_last_activity', 'streak', ['last_activity'], unique=False,
+                    postgresql_where=sa.text('current_streak > 0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_streak_live_last_activity', table_name='streak',
+                  postgresql_where=sa.text('current_streak > 0'))
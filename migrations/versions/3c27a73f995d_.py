@@ -0,0 +1,69 @@
+"""empty message
+
+Revision ID: 3c27a73f995d
+Revises: ce3ccf9f9a75
+Create Date: 2026-10-18 14:26:40.136782
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c27a73f995d'
+down_revision: Union[str, Sequence[str], None] = 'ce3ccf9f9a75'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PROFILE_CHILD_TABLES = ('streak', 'language_progress', 'user_achievement')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('profile', sa.Column('version', sa.BigInteger(), server_default='1', nullable=False))
+
+    op.execute("INSERT INTO catalog_version (name) VALUES ('country') ON CONFLICT DO NOTHING")
+    op.execute('CREATE TRIGGER country_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+               'ON country FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()')
+
+    op.execute("""
+        CREATE FUNCTION next_profile_version() RETURNS trigger AS $$
+        BEGIN
+            NEW.version := OLD.version + 1;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute('CREATE TRIGGER profile_version BEFORE UPDATE ON profile '
+               'FOR EACH ROW EXECUTE FUNCTION next_profile_version()')
+
+    op.execute("""
+        CREATE FUNCTION bump_profile_version() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                UPDATE profile SET version = version + 1 WHERE id = OLD.user_id;
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.user_id IS DISTINCT FROM OLD.user_id) THEN
+                UPDATE profile SET version = version + 1 WHERE id = NEW.user_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in PROFILE_CHILD_TABLES:
+        op.execute(f'CREATE TRIGGER {table}_profile_version AFTER INSERT OR UPDATE OR DELETE '
+                   f'ON {table} FOR EACH ROW EXECUTE FUNCTION bump_profile_version()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in PROFILE_CHILD_TABLES:
+        op.execute(f'DROP TRIGGER {table}_profile_version ON {table}')
+    op.execute('DROP FUNCTION bump_profile_version()')
+    op.execute('DROP TRIGGER profile_version ON profile')
+    op.execute('DROP FUNCTION next_profile_version()')
+    op.execute('DROP TRIGGER country_catalog_version ON country')
+    op.execute("DELETE FROM catalog_version WHERE name = 'country'")
+    op.drop_column('profile', 'version')
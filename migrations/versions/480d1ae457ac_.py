@@ -0,0 +1,44 @@
+"""empty message
+
+Revision ID: 480d1ae457ac
+Revises: 340361458f33
+Create Date: 2026-10-18 20:36:52.671440
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '480d1ae457ac'
+down_revision: Union[str, Sequence[str], None] = '340361458f33'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('reminder_run',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('last_user_id', sa.Integer(), nullable=False),
+    sa.Column('sent', sa.BigInteger(), nullable=False),
+    sa.Column('elapsed_ms', sa.BigInteger(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('day')
+    )
+    op.drop_index('ix_streak_live_last_activity', table_name='streak',
+                  postgresql_where=sa.text('current_streak > 0'))
+    op.create_index('ix_streak_live_last_activity', 'streak', ['last_activity', 'user_id'], unique=False,
+                    postgresql_include=['current_streak'], postgresql_where=sa.text('current_streak > 0'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_streak_live_last_activity', table_name='streak',
+                  postgresql_include=['current_streak'], postgresql_where=sa.text('current_streak > 0'))
+    op.create_index('ix_streak_live_last_activity', 'streak', ['last_activity'], unique=False,
+                    postgresql_where=sa.text('current_streak > 0'))
+    op.drop_table('reminder_run')
@@ -0,0 +1,100 @@
+"""empty message
+
+Revision ID: 76e945463415
+Revises: 212e9aea64ba
+Create Date: 2026-10-19 00:21:37.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '76e945463415'
+down_revision: Union[str, Sequence[str], None] = '212e9aea64ba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('suggestion_queue',
+    sa.Column('user_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.drop_column('friend_suggestion', 'signature')
+
+    # A follow edge changes the follower's candidates; language_progress rows
+    # only appear or vanish when a user starts or drops a language, so XP
+    # updates never reach this trigger.
+    op.execute("""
+        CREATE FUNCTION enqueue_suggestions() RETURNS trigger AS $$
+        BEGIN
+            IF TG_TABLE_NAME = 'follow' THEN
+                IF TG_OP = 'INSERT' THEN
+                    INSERT INTO suggestion_queue (user_id) SELECT DISTINCT follower_id FROM new_rows
+                    ON CONFLICT DO NOTHING;
+                ELSIF TG_OP = 'DELETE' THEN
+                    INSERT INTO suggestion_queue (user_id) SELECT DISTINCT follower_id FROM old_rows
+                    ON CONFLICT DO NOTHING;
+                ELSE
+                    INSERT INTO suggestion_queue (user_id)
+                    SELECT follower_id FROM new_rows UNION SELECT follower_id FROM old_rows
+                    ON CONFLICT DO NOTHING;
+                END IF;
+            ELSIF TG_OP = 'INSERT' THEN
+                INSERT INTO suggestion_queue (user_id) SELECT DISTINCT user_id FROM new_rows
+                ON CONFLICT DO NOTHING;
+            ELSE
+                INSERT INTO suggestion_queue (user_id) SELECT DISTINCT user_id FROM old_rows
+                ON CONFLICT DO NOTHING;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute('CREATE TRIGGER follow_suggestions_ins AFTER INSERT ON follow '
+               'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION enqueue_suggestions()')
+    op.execute('CREATE TRIGGER follow_suggestions_upd AFTER UPDATE ON follow '
+               'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+               'FOR EACH STATEMENT EXECUTE FUNCTION enqueue_suggestions()')
+    op.execute('CREATE TRIGGER follow_suggestions_del AFTER DELETE ON follow '
+               'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION enqueue_suggestions()')
+    op.execute('CREATE TRIGGER language_progress_suggestions_ins AFTER INSERT ON language_progress '
+               'REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT EXECUTE FUNCTION enqueue_suggestions()')
+    op.execute('CREATE TRIGGER language_progress_suggestions_del AFTER DELETE ON language_progress '
+               'REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT EXECUTE FUNCTION enqueue_suggestions()')
+
+    # Row level with a WHEN clause: profile is updated on every lesson
+    # completion (version bumps) and those updates must not call anything.
+    op.execute("""
+        CREATE FUNCTION enqueue_profile_suggestions() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO suggestion_queue (user_id) VALUES (NEW.id) ON CONFLICT DO NOTHING;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute('CREATE TRIGGER profile_suggestions AFTER UPDATE OF country_id ON profile '
+               'FOR EACH ROW WHEN (OLD.country_id IS DISTINCT FROM NEW.country_id) '
+               'EXECUTE FUNCTION enqueue_profile_suggestions()')
+
+    op.execute('INSERT INTO suggestion_queue (user_id) SELECT DISTINCT follower_id FROM follow')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER profile_suggestions ON profile')
+    op.execute('DROP FUNCTION enqueue_profile_suggestions()')
+    for trigger, table in (('follow_suggestions_ins', 'follow'), ('follow_suggestions_upd', 'follow'),
+                           ('follow_suggestions_del', 'follow'),
+                           ('language_progress_suggestions_ins', 'language_progress'),
+                           ('language_progress_suggestions_del', 'language_progress')):
+        op.execute(f'DROP TRIGGER {trigger} ON {table}')
+    op.execute('DROP FUNCTION enqueue_suggestions()')
+
+    op.add_column('friend_suggestion', sa.Column('signature', sa.BigInteger(), server_default='0', nullable=False))
+    op.alter_column('friend_suggestion', 'signature', server_default=None)
+    op.drop_table('suggestion_queue')
@@ -0,0 +1,31 @@
+"""empty message
+
+Revision ID: 7aa7679ab09c
+Revises: b74992505685
+Create Date: 2026-10-18 17:42:10.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7aa7679ab09c'
+down_revision: Union[str, Sequence[str], None] = 'b74992505685'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('language_progress', sa.Column('updated_at', sa.DateTime(),
+                                                 server_default=sa.text('LOCALTIMESTAMP'), nullable=False))
+    op.create_index(op.f('ix_language_progress_updated_at'), 'language_progress', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_language_progress_updated_at'), table_name='language_progress')
+    op.drop_column('language_progress', 'updated_at')
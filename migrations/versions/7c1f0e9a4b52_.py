@@ -0,0 +1,31 @@
+"""empty message
+
+Revision ID: 7c1f0e9a4b52
+Revises: d8022bcbe9ed
+Create Date: 2026-10-18 12:31:47.903118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1f0e9a4b52'
+down_revision: Union[str, Sequence[str], None] = 'd8022bcbe9ed'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("DELETE FROM rating WHERE streak_id IN ("
+               "SELECT a.id FROM streak a JOIN streak b ON a.user_id = b.user_id AND a.id > b.id)")
+    op.execute("DELETE FROM streak a USING streak b WHERE a.user_id = b.user_id AND a.id > b.id")
+    op.create_unique_constraint('uq_streak_user', 'streak', ['user_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_streak_user', 'streak', type_='unique')
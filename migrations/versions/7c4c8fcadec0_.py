@@ -0,0 +1,30 @@
+"""empty message
+
+Revision ID: 7c4c8fcadec0
+Revises: a6038cdc0687
+Create Date: 2026-10-18 15:47:33.190448
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c4c8fcadec0'
+down_revision: Union[str, Sequence[str], None] = 'a6038cdc0687'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('lesson_completion', sa.Column('client_key', sa.String(length=64), nullable=True))
+    op.create_unique_constraint('uq_completion_client_key', 'lesson_completion', ['user_id', 'client_key'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_completion_client_key', 'lesson_completion', type_='unique')
+    op.drop_column('lesson_completion', 'client_key')
@@ -0,0 +1,42 @@
+"""empty message
+
+Revision ID: 7e1a82a288f4
+Revises: 7c1f0e9a4b52
+Create Date: 2026-10-18 13:05:12.418260
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e1a82a288f4'
+down_revision: Union[str, Sequence[str], None] = '7c1f0e9a4b52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('course_progress',
+    sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('course_id', sa.Integer(), nullable=False),
+    sa.Column('completed_order', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['course_id'], ['course.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['profile.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'course_id', name='uq_user_course')
+    )
+    op.create_index(op.f('ix_course_progress_course_id'), 'course_progress', ['course_id'], unique=False)
+    op.execute('INSERT INTO course_progress (user_id, course_id, completed_order) '
+               'SELECT lc.user_id, l.course_id, max(l."order") FROM lesson_completion lc '
+               'JOIN lesson l ON l.id = lc.lesson_id GROUP BY lc.user_id, l.course_id')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_course_progress_course_id'), table_name='course_progress')
+    op.drop_table('course_progress')
@@ -0,0 +1,37 @@
+"""empty message
+
+Revision ID: 9ce60d08aca7
+Revises: f6cf8b84af68
+Create Date: 2026-10-18 21:12:40.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9ce60d08aca7'
+down_revision: Union[str, Sequence[str], None] = 'f6cf8b84af68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('friend_suggestion',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('candidates', sa.JSON(), nullable=False),
+    sa.Column('signature', sa.BigInteger(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    op.create_index(op.f('ix_friend_suggestion_computed_at'), 'friend_suggestion', ['computed_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_friend_suggestion_computed_at'), table_name='friend_suggestion')
+    op.drop_table('friend_suggestion')
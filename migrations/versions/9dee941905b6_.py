@@ -0,0 +1,65 @@
+"""empty message
+
+Revision ID: 9dee941905b6
+Revises: 76e945463415
+Create Date: 2026-10-19 01:12:08.551932
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9dee941905b6'
+down_revision: Union[str, Sequence[str], None] = '76e945463415'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PROFILE_CHILD_TABLES = ('streak', 'language_progress', 'user_achievement')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # profile.version is now bumped by the write paths that change the profile
+    # payload (UserProfile.bump_version); the profile_version trigger on profile
+    # itself stays.
+    for table in PROFILE_CHILD_TABLES:
+        for suffix in ('ins', 'upd', 'del'):
+            op.execute(f'DROP TRIGGER {table}_profile_version_{suffix} ON {table}')
+    op.execute('DROP FUNCTION bump_profile_versions()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("""
+        CREATE FUNCTION bump_profile_versions() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE profile SET version = version + 1
+                WHERE id IN (SELECT user_id FROM new_rows)
+                  AND xmin::text::bigint <> txid_current() % 4294967296;
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE profile SET version = version + 1
+                WHERE id IN (SELECT user_id FROM old_rows)
+                  AND xmin::text::bigint <> txid_current() % 4294967296;
+            ELSE
+                UPDATE profile SET version = version + 1
+                WHERE id IN (SELECT user_id FROM new_rows UNION SELECT user_id FROM old_rows)
+                  AND xmin::text::bigint <> txid_current() % 4294967296;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in PROFILE_CHILD_TABLES:
+        op.execute(f'CREATE TRIGGER {table}_profile_version_ins AFTER INSERT ON {table} '
+                   f'REFERENCING NEW TABLE AS new_rows '
+                   f'FOR EACH STATEMENT EXECUTE FUNCTION bump_profile_versions()')
+        op.execute(f'CREATE TRIGGER {table}_profile_version_upd AFTER UPDATE ON {table} '
+                   f'REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows '
+                   f'FOR EACH STATEMENT EXECUTE FUNCTION bump_profile_versions()')
+        op.execute(f'CREATE TRIGGER {table}_profile_version_del AFTER DELETE ON {table} '
+                   f'REFERENCING OLD TABLE AS old_rows '
+                   f'FOR EACH STATEMENT EXECUTE FUNCTION bump_profile_versions()')
@@ -0,0 +1,31 @@
+"""empty message
+
+Revision ID: a6038cdc0687
+Revises: 3c27a73f995d
+Create Date: 2026-10-18 15:02:18.664021
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6038cdc0687'
+down_revision: Union[str, Sequence[str], None] = '3c27a73f995d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("INSERT INTO catalog_version (name) VALUES ('option') ON CONFLICT DO NOTHING")
+    op.execute('CREATE TRIGGER option_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+               'ON "option" FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER option_catalog_version ON "option"')
+    op.execute("DELETE FROM catalog_version WHERE name = 'option'")
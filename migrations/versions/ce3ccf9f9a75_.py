@@ -0,0 +1,51 @@
+"""empty message
+
+Revision ID: ce3ccf9f9a75
+Revises: 7e1a82a288f4
+Create Date: 2026-10-18 13:48:02.551907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ce3ccf9f9a75'
+down_revision: Union[str, Sequence[str], None] = '7e1a82a288f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+CATALOG_TABLES = ('language', 'course', 'lesson', 'exercise')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('catalog_version',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.BigInteger(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.execute("INSERT INTO catalog_version (name) VALUES "
+               + ', '.join(f"('{table}')" for table in CATALOG_TABLES))
+    op.execute("""
+        CREATE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO catalog_version (name, version) VALUES (TG_TABLE_NAME, 1)
+            ON CONFLICT (name) DO UPDATE SET version = catalog_version.version + 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in CATALOG_TABLES:
+        op.execute(f'CREATE TRIGGER {table}_catalog_version AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE '
+                   f'ON "{table}" FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in CATALOG_TABLES:
+        op.execute(f'DROP TRIGGER {table}_catalog_version ON "{table}"')
+    op.execute('DROP FUNCTION bump_catalog_version()')
+    op.drop_table('catalog_version')
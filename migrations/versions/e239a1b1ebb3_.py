@@ -0,0 +1,47 @@
+"""empty message
+
+Revision ID: e239a1b1ebb3
+Revises: 344690b953fd
+Create Date: 2026-10-18 10:12:31.508214
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e239a1b1ebb3'
+down_revision: Union[str, Sequence[str], None] = '344690b953fd'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_token', sa.Column('token_hash', sa.String(length=64), nullable=True))
+    op.add_column('refresh_token', sa.Column('expires_at', sa.DateTime(), nullable=True))
+    op.execute("UPDATE refresh_token "
+               "SET token_hash = encode(sha256(convert_to(token, 'UTF8')), 'hex'), "
+               "expires_at = created_date + interval '3 days'")
+    op.execute("DELETE FROM refresh_token a USING refresh_token b "
+               "WHERE a.token_hash = b.token_hash AND a.id < b.id")
+    op.alter_column('refresh_token', 'token_hash', nullable=False)
+    op.alter_column('refresh_token', 'expires_at', nullable=False)
+    op.drop_column('refresh_token', 'token')
+    op.create_index(op.f('ix_refresh_token_token_hash'), 'refresh_token', ['token_hash'], unique=True)
+    op.create_index(op.f('ix_refresh_token_expires_at'), 'refresh_token', ['expires_at'], unique=False)
+    op.create_index(op.f('ix_refresh_token_user_id'), 'refresh_token', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_refresh_token_user_id'), table_name='refresh_token')
+    op.drop_index(op.f('ix_refresh_token_expires_at'), table_name='refresh_token')
+    op.drop_index(op.f('ix_refresh_token_token_hash'), table_name='refresh_token')
+    # Only digests are stored, the original tokens cannot be restored.
+    op.execute("DELETE FROM refresh_token")
+    op.add_column('refresh_token', sa.Column('token', sa.String(), nullable=False))
+    op.drop_column('refresh_token', 'expires_at')
+    op.drop_column('refresh_token', 'token_hash')
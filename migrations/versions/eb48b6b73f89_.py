@@ -0,0 +1,56 @@
+"""empty message
+
+Revision ID: eb48b6b73f89
+Revises: 7aa7679ab09c
+Create Date: 2026-10-18 18:20:37.904126
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'eb48b6b73f89'
+down_revision: Union[str, Sequence[str], None] = '7aa7679ab09c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('league_membership',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('tier', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('cohort', sa.Integer(), nullable=False),
+    sa.Column('xp', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('position', sa.Integer(), nullable=True),
+    sa.Column('result', sa.Enum('promoted', 'stayed', 'demoted', name='leagueresultchoices'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['profile.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'week', name='uq_league_user_week')
+    )
+    op.create_index('ix_league_membership_cohort', 'league_membership', ['week', 'tier', 'cohort'], unique=False)
+    op.create_table('league_run',
+    sa.Column('week', sa.Date(), nullable=False),
+    sa.Column('phase', sa.String(length=16), nullable=False),
+    sa.Column('tier', sa.Integer(), nullable=False),
+    sa.Column('cohort', sa.Integer(), nullable=False),
+    sa.Column('ranked_rows', sa.BigInteger(), nullable=False),
+    sa.Column('assigned_rows', sa.BigInteger(), nullable=False),
+    sa.Column('elapsed_ms', sa.BigInteger(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('week')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('league_run')
+    op.drop_index('ix_league_membership_cohort', table_name='league_membership')
+    op.drop_table('league_membership')
+    sa.Enum(name='leagueresultchoices').drop(op.get_bind(), checkfirst=True)
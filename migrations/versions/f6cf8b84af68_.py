@@ -0,0 +1,72 @@
+"""empty message
+
+Revision ID: f6cf8b84af68
+Revises: 480d1ae457ac
+Create Date: 2026-10-18 21:12:40.377915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6cf8b84af68'
+down_revision: Union[str, Sequence[str], None] = '480d1ae457ac'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('DELETE FROM follow WHERE follower_id = following_id')
+    op.execute("""
+        DELETE FROM follow f USING follow other
+        WHERE f.follower_id = other.follower_id AND f.following_id = other.following_id AND f.id > other.id
+    """)
+    op.create_unique_constraint('uq_follow_pair', 'follow', ['follower_id', 'following_id'])
+    op.create_index('ix_follow_following_id_follower_id', 'follow', ['following_id', 'follower_id'], unique=False)
+    op.create_check_constraint('ck_follow_not_self', 'follow', 'follower_id <> following_id')
+
+    op.add_column('profile', sa.Column('followers_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('profile', sa.Column('following_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute("""
+        UPDATE profile SET followers_count = counts.n
+        FROM (SELECT following_id AS id, count(*) AS n FROM follow GROUP BY following_id) counts
+        WHERE profile.id = counts.id
+    """)
+    op.execute("""
+        UPDATE profile SET following_count = counts.n
+        FROM (SELECT follower_id AS id, count(*) AS n FROM follow GROUP BY follower_id) counts
+        WHERE profile.id = counts.id
+    """)
+
+    op.execute("""
+        CREATE FUNCTION update_follow_counts() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP <> 'INSERT' THEN
+                UPDATE profile SET following_count = following_count - 1 WHERE id = OLD.follower_id;
+                UPDATE profile SET followers_count = followers_count - 1 WHERE id = OLD.following_id;
+            END IF;
+            IF TG_OP <> 'DELETE' THEN
+                UPDATE profile SET following_count = following_count + 1 WHERE id = NEW.follower_id;
+                UPDATE profile SET followers_count = followers_count + 1 WHERE id = NEW.following_id;
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute('CREATE TRIGGER follow_counts AFTER INSERT OR UPDATE OF follower_id, following_id OR DELETE '
+               'ON follow FOR EACH ROW EXECUTE FUNCTION update_follow_counts()')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER follow_counts ON follow')
+    op.execute('DROP FUNCTION update_follow_counts()')
+    op.drop_column('profile', 'following_count')
+    op.drop_column('profile', 'followers_count')
+    op.drop_constraint('ck_follow_not_self', 'follow', type_='check')
+    op.drop_index('ix_follow_following_id_follower_id', table_name='follow')
+    op.drop_constraint('uq_follow_pair', 'follow', type_='unique')
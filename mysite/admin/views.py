@@ -10,7 +10,7 @@ class UserProfileAdmin(ModelView, model=UserProfile):
     column_list = [UserProfile.first_name, UserProfile.last_name]
 
 class RefreshTokenAdmin(ModelView, model=RefreshToken):
-    column_list = [RefreshToken.token]
+    column_list = [RefreshToken.user_id, RefreshToken.expires_at]
 
 class FollowAdmin(ModelView, model=Follow):
     column_list = [Follow.following_id, Follow.follower_id]
@@ -1,43 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
-from Duolingo.mysite.database.models import Achievement, UserAchievement
+from fastapi import APIRouter, Depends, HTTPException, Response
+from Duolingo.mysite.database.models import Achievement, UserAchievement, UserProfile
 from Duolingo.mysite.database.schema import AchievementInputSchema, AchievementOutSchema
-from Duolingo.mysite.database.db import SessionLocal
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 achievement_router = APIRouter(prefix='/achievements', tags=['Achievements'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
-def give_achievement_if_not_exists(db: Session, user_id: int, code: str) -> bool:
-    achievement = db.query(Achievement).filter(Achievement.code == code).first()
+async def give_achievement_if_not_exists(db: AsyncSession, user_id: int, code: str) -> bool:
+    achievement = await db.scalar(select(Achievement).where(Achievement.code == code))
     if not achievement:
         return False
 
-    exists = db.query(UserAchievement).filter(UserAchievement.user_id == user_id,
-                                              UserAchievement.achievement_id == achievement.id).first()
+    exists = await db.scalar(select(UserAchievement).where(UserAchievement.user_id == user_id,
+                                                           UserAchievement.achievement_id == achievement.id))
 
     if exists:
         return False
 
     db.add(UserAchievement(user_id=user_id, achievement_id=achievement.id))
+    await db.execute(UserProfile.bump_version(user_id))
     return True
 
 
 @achievement_router.get('/', response_model=List[AchievementOutSchema])
-async def list_achievement(db: Session = Depends(get_db)):
-    return db.query(Achievement).all()
+async def list_achievement(response: Response,
+                           page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    return await paginate(db, select(Achievement), page, response, Achievement.id)
 
 
 @achievement_router.get('/{achievement_id}/', response_model=AchievementOutSchema)
-async def detail_achievement(achievement_id: int, db: Session = Depends(get_db)):
-    achievement_db = db.query(Achievement).filter(Achievement.id == achievement_id).first()
+async def detail_achievement(achievement_id: int, db: AsyncSession = Depends(get_db)):
+    achievement_db = await db.scalar(select(Achievement).where(Achievement.id == achievement_id))
     if not achievement_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
@@ -1,36 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from Duolingo.mysite.database.models import AddFriends
 from Duolingo.mysite.database.schema import AddFriendsInputSchema, AddFriendsOutSchema
-from Duolingo.mysite.database.db import SessionLocal
-from sqlalchemy.orm import Session
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
+from sqlalchemy import select
+from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 
 add_friends_router = APIRouter(prefix='/add_friends', tags=['Add Friends'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @add_friends_router.post('/', response_model=AddFriendsOutSchema)
-async def create_add_friend(add_friend: AddFriendsInputSchema, db: Session = Depends(get_db)):
+async def create_add_friend(add_friend: AddFriendsInputSchema, db: AsyncSession = Depends(get_db)):
     add_friend_db = AddFriends(**add_friend.dict())
     db.add(add_friend_db)
-    db.commit()
-    db.refresh(add_friend_db)
+    await db.commit()
+    await db.refresh(add_friend_db)
     return add_friend_db
 
 
-@add_friends_router.get('/', response_model=AddFriendsOutSchema)
-async def list_add_friend(db: Session = Depends(get_db)):
-    return db.query(AddFriends).all()
+@add_friends_router.get('/', response_model=List[AddFriendsOutSchema])
+async def list_add_friend(response: Response, user_id: Optional[int] = None,
+                          page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    query = select(AddFriends)
+    if user_id is not None:
+        query = query.where(AddFriends.user_id == user_id)
+    return await paginate(db, query, page, response, AddFriends.id)
 
 
 @add_friends_router.get('/{add_friend_id}/', response_model=AddFriendsOutSchema)
-async def detail_add_friend(add_friend_id: int, db: Session = Depends(get_db)):
-    add_friend_db = db.query(AddFriends).filter(AddFriends.id == add_friend_id).first()
+async def detail_add_friend(add_friend_id: int, db: AsyncSession = Depends(get_db)):
+    add_friend_db = await db.scalar(select(AddFriends).where(AddFriends.id == add_friend_id))
     if not add_friend_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
@@ -39,24 +38,24 @@ async def detail_add_friend(add_friend_id: int, db: Session = Depends(get_db)):
 
 @add_friends_router.put('/{add_friend_id}/', response_model=dict)
 async def update_add_friend(add_friend_id: int, add_friend: AddFriendsInputSchema,
-                            db: Session = Depends(get_db)):
-    add_friend_db = db.query(AddFriends).filter(AddFriends.id == add_friend_id).first()
+                            db: AsyncSession = Depends(get_db)):
+    add_friend_db = await db.scalar(select(AddFriends).where(AddFriends.id == add_friend_id))
     if not add_friend_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
     for add_friend_key, add_friend_value in add_friend.dict().items():
         setattr(add_friend_db, add_friend_key, add_friend_value)
-    db.commit()
-    db.refresh(add_friend_db)
+    await db.commit()
+    await db.refresh(add_friend_db)
     return {'massage': 'Успешно изменено'}
 
 
 @add_friends_router.delete('/{add_friend_id}/', response_model=dict)
-async def delete_add_friend(add_friend_id: int, db: Session = Depends(get_db)):
-    add_friend_db = db.query(AddFriends).filter(AddFriends.id == add_friend_id).first()
+async def delete_add_friend(add_friend_id: int, db: AsyncSession = Depends(get_db)):
+    add_friend_db = await db.scalar(select(AddFriends).where(AddFriends.id == add_friend_id))
     if not add_friend_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    db.delete(add_friend_db)
-    db.commit()
+    await db.delete(add_friend_db)
+    await db.commit()
     return {'massage': 'Успешно удалено'}
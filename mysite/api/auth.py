@@ -1,9 +1,12 @@
 from fastapi import  APIRouter, Depends, HTTPException
 from Duolingo.mysite.database.models import UserProfile, RefreshToken
 from Duolingo.mysite.database.schema import UserProfileInputSchema, UserProfileOutSchema, UserProfileLoginSchema
-from Duolingo.mysite.database.db import SessionLocal
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.services.identity import forget_user, forget_token, forget_user_tokens
+from Duolingo.mysite.services.hashing import password_hasher, PasswordHasherBusy
+from Duolingo.mysite.services.tokens import hash_token
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from Duolingo.mysite.config import (SECRET_KEY, ALGORITHM,
                                     ACCESS_TOKEN_LIFETIME,
@@ -11,27 +14,27 @@ from Duolingo.mysite.config import (SECRET_KEY, ALGORITHM,
 from datetime import timedelta, datetime
 from jose import jwt
 from typing import Optional
+import secrets
 
 
-pwd_context = CryptContext(schemes=['bcrypt'], deprecated='auto')
 oauth2_schema = OAuth2PasswordBearer(tokenUrl='/auth/login')
 
 
 auth_router = APIRouter(prefix='/auth', tags=['Auth'])
 
-async def get_db():
-    db = SessionLocal()
+async def get_password_hash(password):
     try:
-        yield db
-    finally:
-        db.close()
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(detail='Сервер бош эмес, кийинчерээк кайталаңыз', status_code=503,
+                            headers={'Retry-After': '1'})
 
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password, hashed_password):
+    try:
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        raise HTTPException(detail='Сервер бош эмес, кийинчерээк кайталаңыз', status_code=503,
+                            headers={'Retry-After': '1'})
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
@@ -44,19 +47,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 def create_refresh_token(data: dict):
-    return create_access_token(data, expires_delta=timedelta(days=REFRESH_TOKEN_LIFETIME))
+    # jti keeps two tokens issued in the same second distinct for the unique token_hash index
+    return create_access_token({**data, 'jti': secrets.token_hex(8)},
+                               expires_delta=timedelta(days=REFRESH_TOKEN_LIFETIME))
 
 
 @auth_router.post('/register/', response_model=dict)
-async def register(user: UserProfileInputSchema, db: Session = Depends(get_db)):
-    user_db = db.query(UserProfile).filter(UserProfile.username == user.username).first()
-    email_db = db.query(UserProfile).filter(UserProfile.email == user.email).first()
+async def register(user: UserProfileInputSchema, db: AsyncSession = Depends(get_db)):
+    user_db = await db.scalar(select(UserProfile).where(UserProfile.username == user.username))
+    email_db = await db.scalar(select(UserProfile).where(UserProfile.email == user.email))
     if user_db:
         raise HTTPException(detail='Мындай username бар экен', status_code=400)
     elif email_db:
         raise HTTPException(detail='Мындай email бар экен', status_code=400)
 
-    hash_password = get_password_hash(user.password)
+    hash_password = await get_password_hash(user.password)
     user_data = UserProfile(
         avatar = user.avatar,
         first_name = user.first_name,
@@ -69,46 +74,61 @@ async def register(user: UserProfileInputSchema, db: Session = Depends(get_db)):
         country_id = user.country_id
     )
     db.add(user_data)
-    db.commit()
-    db.refresh(user_data)
+    await db.commit()
+    await db.refresh(user_data)
     return {'message': 'Вы успешно зарегистрированы'}
 
 
 @auth_router.post('/login/', response_model=dict)
-async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user_db = db.query(UserProfile).filter(UserProfile.username == form_data.username).first()
-    if not user_db or not verify_password(form_data.password, user_db.password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user_db = await db.scalar(select(UserProfile).where(UserProfile.username == form_data.username))
+    if not user_db:
         raise HTTPException(detail='Сиз жазган маалымат туура эмес', status_code=401)
 
+    verified, new_hash = await verify_password(form_data.password, user_db.password)
+    if not verified:
+        raise HTTPException(detail='Сиз жазган маалымат туура эмес', status_code=401)
+
+    if new_hash:
+        user_db.password = new_hash
+
     access_token = create_access_token({'sub': user_db.username})
     refresh_token = create_refresh_token({'sub': user_db.username})
 
-    token_db = RefreshToken(user_id=user_db.id, token=refresh_token)
+    token_db = RefreshToken(user_id=user_db.id, token_hash=hash_token(refresh_token),
+                            expires_at=datetime.utcnow() + timedelta(days=REFRESH_TOKEN_LIFETIME))
     db.add(token_db)
-    db.commit()
+    await db.commit()
 
     return {'access_token': access_token, 'refresh_token': refresh_token, 'token_type': 'Bearer'}
 
 
 @auth_router.post('/logout/', response_model=dict)
-async def logout(refresh_token: str, db: Session = Depends(get_db)):
-    stored_token = db.query(RefreshToken).filter(RefreshToken.token == refresh_token).first()
+async def logout(refresh_token: str, db: AsyncSession = Depends(get_db)):
+    user_id = await db.scalar(delete(RefreshToken)
+                              .where(RefreshToken.token_hash == hash_token(refresh_token))
+                              .returning(RefreshToken.user_id))
 
-    if not stored_token:
+    if user_id is None:
         raise HTTPException(detail='Маалымат туура эмес', status_code=401)
 
-    db.delete(stored_token)
-    db.commit()
+    await db.commit()
+    forget_token(refresh_token)
+    forget_user_tokens(user_id)
+    forget_user(user_id)
     return {'message': 'Вы вышли'}
 
 
 @auth_router.post('/refresh_token/', response_model=dict)
-async def logout(refresh_token: str, db: Session = Depends(get_db)):
-    stored_token = db.query(RefreshToken).filter(RefreshToken.token == refresh_token).first()
+async def refresh_access_token(refresh_token: str, db: AsyncSession = Depends(get_db)):
+    username = await db.scalar(select(UserProfile.username)
+                               .join(RefreshToken, RefreshToken.user_id == UserProfile.id)
+                               .where(RefreshToken.token_hash == hash_token(refresh_token),
+                                      RefreshToken.expires_at > datetime.utcnow()))
 
-    if not stored_token:
+    if not username:
         raise HTTPException(detail='Маалымат туура эмес', status_code=401)
 
-    access_token = create_access_token({'sub': stored_token.id})
+    access_token = create_access_token({'sub': username})
 
     return {'access_token': access_token, 'token_type': 'Bearer'}
@@ -0,0 +1,151 @@
+import gzip
+import json
+from dataclasses import dataclass, field
+from typing import Hashable, Optional, Type
+from fastapi import HTTPException, Response
+from pydantic import BaseModel
+from sqlalchemy import Select
+from sqlalchemy.ext.asyncio import AsyncSession
+from Duolingo.mysite.database.schema import LessonOutSchema, ExerciseOutSchema, OptionOutSchema
+from Duolingo.mysite.api.pagination import PageParams, NEXT_CURSOR_HEADER, paginate
+from Duolingo.mysite.api.etag import content_etag, variant_etag, etag_matches, not_modified
+from Duolingo.mysite.services.catalog import catalog_cache
+from Duolingo.mysite.config import CATALOG_CACHE_CONTROL
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_COMPRESS_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dump(schema: Type[BaseModel], obj) -> dict:
+    return schema.model_validate(obj, from_attributes=True).model_dump(mode='json')
+
+
+def lesson_content(lesson) -> dict:
+    return {**dump(LessonOutSchema, lesson),
+            'exercises': [{**dump(ExerciseOutSchema, exercise),
+                           'options': [dump(OptionOutSchema, option)
+                                       for option in sorted(exercise.option, key=lambda option: option.id)]}
+                          for exercise in sorted(lesson.exercise_lesson, key=lambda exercise: exercise.id)]}
+
+
+def accepted_encodings(header: str) -> set:
+    encodings = set()
+    for part in header.split(','):
+        name, *params = part.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            encodings.add(name.strip().lower())
+    return encodings
+
+
+def request_header(scope, name: bytes) -> str:
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return ''
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    """A JSON response body serialized once, with its compressed variants and validators."""
+
+    identity: bytes
+    etag: str
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+    headers: dict = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, content, headers: Optional[dict] = None,
+              cache_control: str = CATALOG_CACHE_CONTROL) -> 'EncodedBody':
+        identity = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(',', ':')).encode()
+        etag = content_etag(identity)
+        headers = {**(headers or {}), 'ETag': etag, 'Cache-Control': cache_control}
+        if len(identity) < MIN_COMPRESS_SIZE:
+            return cls(identity, etag, headers=headers)
+
+        headers['Vary'] = 'Accept-Encoding'
+        return cls(identity, etag,
+                   gzip=gzip.compress(identity, compresslevel=GZIP_LEVEL, mtime=0),
+                   br=brotli.compress(identity, quality=BROTLI_QUALITY) if brotli is not None else None,
+                   headers=headers)
+
+
+class EncodedResponse(Response):
+    """Sends the smallest pre-built variant of an ``EncodedBody`` the client accepts,
+    or a bodyless 304 when the client's If-None-Match already names it."""
+
+    media_type = 'application/json'
+
+    def __init__(self, encoded: EncodedBody, status_code: int = 200):
+        self.encoded = encoded
+        super().__init__(content=encoded.identity, status_code=status_code, headers=encoded.headers)
+
+    async def __call__(self, scope, receive, send) -> None:
+        body, encoding = self.encoded.identity, None
+        if self.encoded.gzip is not None:
+            encodings = accepted_encodings(request_header(scope, b'accept-encoding'))
+            if self.encoded.br is not None and 'br' in encodings:
+                body, encoding = self.encoded.br, 'br'
+            elif 'gzip' in encodings:
+                body, encoding = self.encoded.gzip, 'gzip'
+
+        # Each encoding is a different representation, so it gets its own strong validator.
+        etag = variant_etag(self.encoded.etag, encoding)
+        if etag_matches(request_header(scope, b'if-none-match'), etag):
+            await not_modified({**self.encoded.headers, 'ETag': etag})(scope, receive, send)
+            return
+
+        if encoding is not None:
+            self.body = body
+            self.headers['content-length'] = str(len(body))
+            self.headers['content-encoding'] = encoding
+            self.headers['etag'] = etag
+
+        await super().__call__(scope, receive, send)
+
+
+async def catalog_page(db: AsyncSession, response: Response, entity: str, schema: Type[BaseModel],
+                       key: Hashable, stmt: Select, page: PageParams, *order_by,
+                       cache_control: str = CATALOG_CACHE_CONTROL) -> EncodedResponse:
+    cache_key = ('list', key, page.limit, page.after)
+    encoded = catalog_cache.get(entity, cache_key)
+    if encoded is None:
+        generation = catalog_cache.generation(entity)
+        rows = await paginate(db, stmt, page, response, *order_by)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        encoded = EncodedBody.build([dump(schema, row) for row in rows],
+                                    headers={NEXT_CURSOR_HEADER: cursor} if cursor else None,
+                                    cache_control=cache_control)
+        catalog_cache.set(entity, generation, cache_key, encoded)
+
+    return EncodedResponse(encoded)
+
+
+async def catalog_detail(db: AsyncSession, entity: str, schema: Type[BaseModel],
+                         object_id: int, stmt: Select,
+                         cache_control: str = CATALOG_CACHE_CONTROL) -> EncodedResponse:
+    encoded = catalog_cache.get(entity, ('detail', object_id))
+    if encoded is None:
+        generation = catalog_cache.generation(entity)
+        obj = await db.scalar(stmt)
+        if not obj:
+            raise HTTPException(detail='Мындай маалымат жок', status_code=400)
+
+        encoded = EncodedBody.build(dump(schema, obj), cache_control=cache_control)
+        catalog_cache.set(entity, generation, ('detail', object_id), encoded)
+
+    return EncodedResponse(encoded)
@@ -1,58 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException
-from Duolingo.mysite.database.models import Chat
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Response, WebSocket, WebSocketDisconnect, status
+from Duolingo.mysite.database.models import Chat, ChatMember, Message
 from Duolingo.mysite.database.schema import ChatInputSchema, ChatOutSchema
-from Duolingo.mysite.database.db import SessionLocal
-from typing import List
-from sqlalchemy.orm import Session
+from Duolingo.mysite.database.db import get_db, AsyncSessionLocal
+from Duolingo.mysite.api.deps import authenticate_token
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
+from Duolingo.mysite.services.chat_broker import chat_broker, message_payload, ChatSubscription
+from Duolingo.mysite.config import CHAT_BACKLOG_LIMIT
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 chat_router = APIRouter(prefix='/chat', tags=['Chat'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @chat_router.post('/', response_model=ChatOutSchema)
-async def create_chat(chat: ChatInputSchema, db: Session = Depends(get_db)):
+async def create_chat(chat: ChatInputSchema, db: AsyncSession = Depends(get_db)):
     chat_db = Chat(**chat.dict())
     db.add(chat_db)
-    db.commit()
-    db.refresh(chat_db)
+    await db.commit()
+    await db.refresh(chat_db)
     return chat_db
 
 @chat_router.get('/', response_model=List[ChatOutSchema])
-async def list_chat(db: Session = Depends(get_db)):
-    return db.query(Chat).all()
+async def list_chat(response: Response, language_id: Optional[int] = None,
+                    page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    query = select(Chat)
+    if language_id is not None:
+        query = query.where(Chat.language_id == language_id)
+    return await paginate(db, query, page, response, Chat.id)
 
 @chat_router.get('/{chat_id}/', response_model=ChatOutSchema)
-async def detail_chat(chat_id: int, db: Session = Depends(get_db)):
-    chat_db = db.query(Chat).filter(Chat.id == chat_id).first()
+async def detail_chat(chat_id: int, db: AsyncSession = Depends(get_db)):
+    chat_db = await db.scalar(select(Chat).where(Chat.id == chat_id))
     if not chat_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
     return chat_db
 
 @chat_router.put('/{chat_id}/', response_model=dict)
-async def update_chat(chat_id: int, chat: ChatInputSchema, db: Session = Depends(get_db)):
-    chat_db = db.query(Chat).filter(Chat.id == chat_id).first()
+async def update_chat(chat_id: int, chat: ChatInputSchema, db: AsyncSession = Depends(get_db)):
+    chat_db = await db.scalar(select(Chat).where(Chat.id == chat_id))
     if not chat_db:
         raise HTTPException(detail='Мындай option жок', status_code=400)
 
     for chat_key, chat_value in chat.dict().items():
         setattr(chat_db, chat_key, chat_value)
 
-    db.commit()
-    db.refresh(chat_db)
+    await db.commit()
+    await db.refresh(chat_db)
     return {'message': 'Option озгорулду'}
 
 
 @chat_router.delete('/{chat_id}/', response_model=dict)
-async def delete_chat(chat_id: int, db: Session = Depends(get_db)):
-    chat_db = db.query(Chat).filter(Chat.id == chat_id).first()
+async def delete_chat(chat_id: int, db: AsyncSession = Depends(get_db)):
+    chat_db = await db.scalar(select(Chat).where(Chat.id == chat_id))
     if not chat_db:
         raise HTTPException(detail='Мындай option жок', status_code=400)
-    db.delete(chat_db)
-    db.commit()
+    await db.delete(chat_db)
+    await db.commit()
     return {'message': 'Option удалить болду'}
+
+
+async def replay_messages(websocket: WebSocket, chat_id: int, after: int) -> set:
+    sent = set()
+    while True:
+        async with AsyncSessionLocal() as db:
+            backlog = (await db.scalars(select(Message)
+                                        .where(Message.chat_id == chat_id, Message.id > after)
+                                        .order_by(Message.id)
+                                        .limit(CHAT_BACKLOG_LIMIT))).all()
+        for message in backlog:
+            await websocket.send_text(message_payload(message))
+            sent.add(message.id)
+        if len(backlog) < CHAT_BACKLOG_LIMIT:
+            return sent
+        after = backlog[-1].id
+
+
+async def push_messages(websocket: WebSocket, subscription: ChatSubscription, replayed: set) -> None:
+    while (item := await subscription.get()) is not None:
+        message_id, payload = item
+        if message_id not in replayed:
+            await websocket.send_text(payload)
+    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+
+
+@chat_router.websocket('/{chat_id}/ws')
+async def chat_socket(websocket: WebSocket, chat_id: int, token: Optional[str] = None,
+                      after: Optional[int] = None):
+    # Browsers cannot set headers on a WebSocket handshake, so the token may also come as a query parameter.
+    authorization = websocket.headers.get('authorization', '')
+    token = token or authorization.removeprefix('Bearer ')
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await authenticate_token(token, db)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        member_id = await db.scalar(select(ChatMember.id).where(ChatMember.chat_id == chat_id,
+                                                                ChatMember.user_id == user.id))
+    if member_id is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await websocket.accept()
+    # Subscribe before replaying so nothing committed in between is missed; replayed ids are not pushed twice.
+    subscription = chat_broker.subscribe(chat_id)
+    pusher = None
+    try:
+        replayed = await replay_messages(websocket, chat_id, after) if after is not None else set()
+        pusher = asyncio.create_task(push_messages(websocket, subscription, replayed))
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_broker.unsubscribe(subscription)
+        if pusher is not None:
+            pusher.cancel()
+            await asyncio.gather(pusher, return_exceptions=True)
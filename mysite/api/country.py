@@ -1,64 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from Duolingo.mysite.database.models import Country
 from Duolingo.mysite.database.schema import CountryInputSchema, CountryOutSchema
-from Duolingo.mysite.database.db import SessionLocal
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params
+from Duolingo.mysite.api.catalog import catalog_page, catalog_detail
+from Duolingo.mysite.services.catalog import catalog_cache
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 country_router = APIRouter(prefix='/countries', tags=['Countries'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @country_router.post('/', response_model=CountryOutSchema)
-async def create_country(country: CountryInputSchema, db: Session = Depends(get_db)):
+async def create_country(country: CountryInputSchema, db: AsyncSession = Depends(get_db)):
     country_db = Country(**country.dict())
     db.add(country_db)
-    db.commit()
-    db.refresh(country_db)
+    await db.commit()
+    catalog_cache.invalidate('country')
+    await db.refresh(country_db)
     return country_db
 
 
 @country_router.get('/', response_model=List[CountryOutSchema])
-async def list_country(db: Session = Depends(get_db)):
-    return db.query(Country).all()
+async def list_country(response: Response,
+                       page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    return await catalog_page(db, response, 'country', CountryOutSchema, None,
+                              select(Country), page, Country.id)
 
 
 @country_router.get('/{country_id}/', response_model=CountryOutSchema)
-async def detail_country(country_id: int, db: Session = Depends(get_db)):
-    country_db = db.query(Country).filter(Country.id == country_id).first()
-    if not country_db:
-        raise HTTPException(detail='Мындай маалымат жок', status_code=400)
-
-    return country_db
+async def detail_country(country_id: int, db: AsyncSession = Depends(get_db)):
+    return await catalog_detail(db, 'country', CountryOutSchema, country_id,
+                                select(Country).where(Country.id == country_id))
 
 
 @country_router.put('/{country_id}/', response_model=dict)
 async def update_country(country_id: int, country: CountryInputSchema,
-                         db: Session = Depends(get_db)):
-    country_db = db.query(Country).filter(Country.id == country_id).first()
+                         db: AsyncSession = Depends(get_db)):
+    country_db = await db.scalar(select(Country).where(Country.id == country_id))
     if not country_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
     for country_key, country_value in country.dict().items():
         setattr(country_db, country_key, country_value)
 
-    db.commit()
-    db.refresh(country_db)
+    await db.commit()
+    catalog_cache.invalidate('country')
+    await db.refresh(country_db)
     return {'massage': 'Успешно изменено'}
 
 
 @country_router.delete('/{country_id}/', response_model=dict)
-async def delete_country(country_id: int, db: Session = Depends(get_db)):
-    country_db = db.query(Country).filter(Country.id == country_id).first()
+async def delete_country(country_id: int, db: AsyncSession = Depends(get_db)):
+    country_db = await db.scalar(select(Country).where(Country.id == country_id))
     if not country_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    db.delete(country_db)
-    db.commit()
+    await db.delete(country_db)
+    await db.commit()
+    catalog_cache.invalidate('country')
     return {'massage': 'Успешно удалено'}
@@ -1,64 +1,104 @@
-from fastapi import APIRouter, Depends, HTTPException
+import asyncio
+import re
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from fastapi.responses import FileResponse
 from Duolingo.mysite.database.models import Course
 from Duolingo.mysite.database.schema import CourseInputSchema, CourseOutSchema
-from Duolingo.mysite.database.db import SessionLocal
-from typing import List
-from sqlalchemy.orm import Session
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params
+from Duolingo.mysite.api.catalog import catalog_page, catalog_detail
+from Duolingo.mysite.api.etag import version_etag, etag_matches, not_modified
+from Duolingo.mysite.api.packs import CoursePack, load_course_pack, write_delta
+from Duolingo.mysite.services.catalog import catalog_cache
+from Duolingo.mysite.config import CATALOG_CACHE_CONTROL, PACKS_ACCEL_PREFIX
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 course_router = APIRouter(prefix='/course', tags=['Course'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+PACK_VERSION_RE = re.compile(r'^[0-9a-f]{64}$')
 
 
+def pack_response(pack: CoursePack, base: Optional[str], headers: dict) -> Response:
+    if PACKS_ACCEL_PREFIX:
+        headers['X-Accel-Redirect'] = PACKS_ACCEL_PREFIX + pack.relative_path(base)
+        return Response(media_type='application/gzip', headers=headers)
+
+    return FileResponse(pack.path(base), media_type='application/gzip', headers=headers,
+                        filename=f'course-{pack.course_id}.json.gz')
+
 @course_router.post('/', response_model=CourseOutSchema)
-async def create_course(course: CourseInputSchema, db: Session = Depends(get_db)):
+async def create_course(course: CourseInputSchema, db: AsyncSession = Depends(get_db)):
     course_db = Course(**course.dict())
     db.add(course_db)
-    db.commit()
-    db.refresh(course_db)
+    await db.commit()
+    catalog_cache.invalidate('course')
+    await db.refresh(course_db)
     return course_db
 
 
 @course_router.get('/', response_model=List[CourseOutSchema])
-async def list_course(db: Session = Depends(get_db)):
-    return db.query(Course).all()
+async def list_course(response: Response, language_id: Optional[int] = None,
+                      page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    query = select(Course)
+    if language_id is not None:
+        query = query.where(Course.language_id == language_id)
+    return await catalog_page(db, response, 'course', CourseOutSchema, language_id,
+                              query, page, Course.id)
 
 
 @course_router.get('/{course_id}/', response_model=CourseOutSchema)
-async def detail_course(course_id: int, db: Session = Depends(get_db)):
-    course_db = db.query(Course).filter(Course.id == course_id).first()
-    if not course_db:
+async def detail_course(course_id: int, db: AsyncSession = Depends(get_db)):
+    return await catalog_detail(db, 'course', CourseOutSchema, course_id,
+                                select(Course).where(Course.id == course_id))
+
+
+@course_router.get('/{course_id}/pack')
+async def course_pack(course_id: int, since: Optional[str] = None, if_none_match: Optional[str] = Header(None),
+                      db: AsyncSession = Depends(get_db)):
+    if since is not None and not PACK_VERSION_RE.match(since):
+        raise HTTPException(detail='Туура эмес since', status_code=400)
+
+    pack = await load_course_pack(db, course_id)
+    if pack is None:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    return course_db
+    headers = {'ETag': version_etag(pack.version), 'X-Pack-Version': pack.version,
+               'Cache-Control': CATALOG_CACHE_CONTROL}
+    if since == pack.version or etag_matches(if_none_match, headers['ETag']):
+        return not_modified(headers)
+
+    # A delta is only possible when the client's version was built here; otherwise fall back to the full pack.
+    base = since if since is not None and await asyncio.to_thread(write_delta, pack, since) else None
+    if base is not None:
+        headers['X-Pack-Base'] = base
+    return pack_response(pack, base, headers)
 
 
 @course_router.put('/{course_id}/', response_model=dict)
 async def update_course(course_id: int, course: CourseInputSchema,
-                             db: Session = Depends(get_db)):
-    course_db = db.query(Course).filter(Course.id == course_id).first()
+                             db: AsyncSession = Depends(get_db)):
+    course_db = await db.scalar(select(Course).where(Course.id == course_id))
     if not course_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
     for course_key, course_value in course.dict().items():
         setattr(course_db, course_key, course_value)
 
-    db.commit()
-    db.refresh(course_db)
+    await db.commit()
+    catalog_cache.invalidate('course')
+    await db.refresh(course_db)
     return {'message': 'Успешно изменено'}
 
 
 @course_router.delete('/{course_id}/', response_model=dict)
-async def delete_course(course_id: int, db: Session = Depends(get_db)):
-    course_db = db.query(Course).filter(Course.id == course_id).first()
+async def delete_course(course_id: int, db: AsyncSession = Depends(get_db)):
+    course_db = await db.scalar(select(Course).where(Course.id == course_id))
     if not course_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    db.delete(course_db)
-    db.commit()
+    await db.delete(course_db)
+    await db.commit()
+    catalog_cache.invalidate('course')
     return {'message': 'Успешно удалено'}
\ No newline at end of file
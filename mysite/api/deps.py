@@ -1,43 +1,62 @@
+import time
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt, JWTError
 from Duolingo.mysite.api.auth import oauth2_schema
-from Duolingo.mysite.database.db import SessionLocal
+from Duolingo.mysite.database.db import get_db
 from Duolingo.mysite.database.models import UserProfile
+from Duolingo.mysite.services.identity import (CurrentUser, token_cache, get_cached_user,
+                                               remember_user, forget_token)
 from Duolingo.mysite.config import SECRET_KEY, ALGORITHM
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
-
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_schema),
-    db: Session = Depends(get_db)
-) -> UserProfile:
+    db: AsyncSession = Depends(get_db)
+) -> CurrentUser:
+    return await authenticate_token(token, db)
+
+
+async def authenticate_token(token: str, db: AsyncSession) -> CurrentUser:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str | None = payload.get("sub")
-        if username is None:
+    cached = token_cache.get(token)
+    if cached is None:
+        try:
+            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            username: str | None = payload.get("sub")
+            if username is None:
+                raise credentials_exception
+        except JWTError:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-
-    user = (
-        db.query(UserProfile)
-        .filter(UserProfile.username == username).first())
+        user_id = None
+    else:
+        username, user_id = cached
 
+    user = get_cached_user(user_id) if user_id is not None else None
     if user is None:
-        raise credentials_exception
+        if user_id is None:
+            profile = await db.scalar(
+                select(UserProfile)
+                .where(UserProfile.username == username))
+        else:
+            profile = await db.get(UserProfile, user_id)
+
+        if profile is None or profile.username != username:
+            forget_token(token)
+            raise credentials_exception
+
+        user = CurrentUser.from_profile(profile)
+        remember_user(user)
+
+    if cached is None:
+        expires_in = payload['exp'] - time.time() if 'exp' in payload else None
+        token_cache.set(token, (username, user.id), ttl=expires_in)
 
     return user
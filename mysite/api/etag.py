@@ -0,0 +1,27 @@
+from hashlib import blake2b
+from typing import Optional
+from fastapi import Response
+
+
+def content_etag(body: bytes) -> str:
+    return '"' + blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def version_etag(*parts) -> str:
+    return '"' + '.'.join(str(part) for part in parts) + '"'
+
+
+def variant_etag(etag: str, encoding: Optional[str]) -> str:
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
+
+
+def not_modified(headers: dict) -> Response:
+    return Response(status_code=304, headers=headers)
@@ -1,63 +1,65 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from Duolingo.mysite.database.models import Exercise
 from Duolingo.mysite.database.schema import ExerciseInputSchema, ExerciseOutSchema
-from Duolingo.mysite.database.db import SessionLocal
-from typing import List
-from sqlalchemy.orm import Session
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params
+from Duolingo.mysite.api.catalog import catalog_page, catalog_detail
+from Duolingo.mysite.services.catalog import catalog_cache
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 exercise_router = APIRouter(prefix='/exercise', tags=['Exercise'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @exercise_router.post('/', response_model=ExerciseOutSchema)
-async def create_exercise(exercise: ExerciseInputSchema, db: Session = Depends(get_db)):
+async def create_exercise(exercise: ExerciseInputSchema, db: AsyncSession = Depends(get_db)):
     exercise_db = Exercise(**exercise.dict())
     db.add(exercise_db)
-    db.commit()
-    db.refresh(exercise_db)
+    await db.commit()
+    catalog_cache.invalidate('exercise')
+    await db.refresh(exercise_db)
     return exercise_db
 
 
 @exercise_router.get('/', response_model=List[ExerciseOutSchema])
-async def list_exercise(db: Session = Depends(get_db)):
-    return db.query(Exercise).all()
+async def list_exercise(response: Response, lesson_id: Optional[int] = None,
+                        page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    query = select(Exercise)
+    if lesson_id is not None:
+        query = query.where(Exercise.lesson_id == lesson_id)
+    return await catalog_page(db, response, 'exercise', ExerciseOutSchema, lesson_id,
+                              query, page, Exercise.id)
 
 
 @exercise_router.get('/{exercise_id}/', response_model=ExerciseOutSchema)
-async def detail_exercise(exercise_id: int, db: Session = Depends(get_db)):
-    exercise_db = db.query(Exercise).filter(Exercise.id == exercise_id).first()
-    if not exercise_db:
-        raise HTTPException(detail='Мындай маалымат жок', status_code=400)
-    return exercise_db
+async def detail_exercise(exercise_id: int, db: AsyncSession = Depends(get_db)):
+    return await catalog_detail(db, 'exercise', ExerciseOutSchema, exercise_id,
+                                select(Exercise).where(Exercise.id == exercise_id))
 
 
 @exercise_router.put('/{exercise_id}/', response_model=dict)
 async def update_exercise(exercise_id: int, exercise: ExerciseInputSchema,
-                          db: Session = Depends(get_db)):
-    exercise_db = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+                          db: AsyncSession = Depends(get_db)):
+    exercise_db = await db.scalar(select(Exercise).where(Exercise.id == exercise_id))
     if not exercise_db:
         raise HTTPException(detail='Мындай exercise жок', status_code=400)
 
     for exercise_key, exercise_value in exercise.dict().items():
         setattr(exercise_db, exercise_key, exercise_value)
 
-    db.commit()
-    db.refresh(exercise_db)
+    await db.commit()
+    catalog_cache.invalidate('exercise')
+    await db.refresh(exercise_db)
     return {'message': 'Exercise озгорулду'}
 
 
 @exercise_router.delete('/{exercise_id}/', response_model=dict)
-async def delete_exercise(exercise_id: int, db: Session = Depends(get_db)):
-    exercise_db = db.query(Exercise).filter(Exercise.id == exercise_id).first()
+async def delete_exercise(exercise_id: int, db: AsyncSession = Depends(get_db)):
+    exercise_db = await db.scalar(select(Exercise).where(Exercise.id == exercise_id))
     if not exercise_db:
         raise HTTPException(detail='Мындай exercise жок', status_code=400)
 
-    db.delete(exercise_db)
-    db.commit()
+    await db.delete(exercise_db)
+    await db.commit()
+    catalog_cache.invalidate('exercise')
     return {'message': 'Exercise удалить болду'}
\ No newline at end of file
@@ -1,39 +1,118 @@
-from fastapi import APIRouter, Depends, HTTPException
-from Duolingo.mysite.database.models import Follow
-from Duolingo.mysite.database.schema import FollowOutSchema, FollowInputSchema
-from Duolingo.mysite.database.db import SessionLocal
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from Duolingo.mysite.database.models import Follow, UserProfile
+from Duolingo.mysite.database.schema import (FollowOutSchema, FollowInputSchema, FollowUserSchema,
+                                             FollowStatusSchema, FriendSuggestionSchema)
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
+from Duolingo.mysite.services.events import record_activity
+from Duolingo.mysite.services.social import follow_graph, is_following
+from Duolingo.mysite.services.suggestions import load_suggestions
+from Duolingo.mysite.config import SUGGESTION_TOP_K
+from sqlalchemy import select, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from typing import List, Optional
 
 
 follow_router = APIRouter(prefix='/follow', tags=['Follow'])
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @follow_router.post("/", response_model=FollowOutSchema)
-def create_follow(
-    follow: FollowInputSchema, db: Session = Depends(get_db)):
+async def create_follow(
+    follow: FollowInputSchema, db: AsyncSession = Depends(get_db)):
+
+    if follow.follower_id == follow.following_id:
+        raise HTTPException(detail='Өзүңүзгө жазыла албайсыз', status_code=400)
 
-    follow = Follow(**follow.dict())
-    db.add(follow)
-    db.commit()
-    db.refresh(follow)
+    follow = await db.scalar(insert(Follow).values(**follow.dict())
+                             .on_conflict_do_nothing(constraint='uq_follow_pair')
+                             .returning(Follow))
+    if follow is None:
+        raise HTTPException(detail='Сиз буга чейин жазылгансыз', status_code=400)
+
+    await db.commit()
+    follow_graph.forget(follow.follower_id)
+    record_activity(follow.follower_id, 'follow', following_id=follow.following_id)
     return follow
 
 @follow_router.get('/', response_model=List[FollowOutSchema])
-async def list_user(db: Session = Depends(get_db)):
-    return db.query(Follow).all()
+async def list_user(response: Response, follower_id: Optional[int] = None, following_id: Optional[int] = None,
+                    page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    query = select(Follow)
+    if follower_id is not None:
+        query = query.where(Follow.follower_id == follower_id)
+    if following_id is not None:
+        query = query.where(Follow.following_id == following_id)
+    return await paginate(db, query, page, response, Follow.id)
+
+
+def follow_users(rows, id_key: str) -> list:
+    return [{'id': getattr(row, id_key), 'username': row.username, 'avatar': row.avatar} for row in rows]
+
+
+@follow_router.get('/{user_id}/followers/', response_model=List[FollowUserSchema])
+async def list_followers(user_id: int, response: Response, page: PageParams = Depends(page_params),
+                         db: AsyncSession = Depends(get_db)):
+    query = (select(Follow.follower_id, UserProfile.username, UserProfile.avatar)
+             .join(UserProfile, UserProfile.id == Follow.follower_id)
+             .where(Follow.following_id == user_id))
+    return follow_users(await paginate(db, query, page, response, Follow.follower_id), 'follower_id')
+
+
+@follow_router.get('/{user_id}/following/', response_model=List[FollowUserSchema])
+async def list_following(user_id: int, response: Response, page: PageParams = Depends(page_params),
+                         db: AsyncSession = Depends(get_db)):
+    query = (select(Follow.following_id, UserProfile.username, UserProfile.avatar)
+             .join(UserProfile, UserProfile.id == Follow.following_id)
+             .where(Follow.follower_id == user_id))
+    return follow_users(await paginate(db, query, page, response, Follow.following_id), 'following_id')
+
+
+@follow_router.get('/{user_id}/mutual/', response_model=List[FollowUserSchema])
+async def list_mutual(user_id: int, response: Response, page: PageParams = Depends(page_params),
+                      db: AsyncSession = Depends(get_db)):
+    # Walks the user's followees in order and probes the unique pair index for the reverse edge.
+    back = aliased(Follow)
+    query = (select(Follow.following_id, UserProfile.username, UserProfile.avatar)
+             .join(back, and_(back.follower_id == Follow.following_id, back.following_id == Follow.follower_id))
+             .join(UserProfile, UserProfile.id == Follow.following_id)
+             .where(Follow.follower_id == user_id))
+    return follow_users(await paginate(db, query, page, response, Follow.following_id), 'following_id')
+
+
+@follow_router.get('/{user_id}/suggestions/', response_model=List[FriendSuggestionSchema])
+async def list_suggestions(user_id: int, limit: int = Query(10, ge=1, le=SUGGESTION_TOP_K),
+                           db: AsyncSession = Depends(get_db)):
+    # Stored rows are refreshed in the background; drop anyone followed since then.
+    candidates = await load_suggestions(db, user_id)
+    if not candidates:
+        return []
+    followed = set(await db.scalars(select(Follow.following_id)
+                                    .where(Follow.follower_id == user_id,
+                                           Follow.following_id.in_([c[0] for c in candidates]))))
+    picked = [c for c in candidates if c[0] not in followed][:limit]
+    if not picked:
+        return []
+
+    profiles = {row.id: row for row in await db.execute(select(UserProfile.id, UserProfile.username,
+                                                                UserProfile.avatar)
+                                                         .where(UserProfile.id.in_([c[0] for c in picked])))}
+    return [{'id': candidate_id, 'username': profiles[candidate_id].username,
+             'avatar': profiles[candidate_id].avatar, 'mutual_count': mutual_count, 'score': score}
+            for candidate_id, score, mutual_count in picked if candidate_id in profiles]
+
+
+@follow_router.get('/{follower_id}/follows/{following_id}/', response_model=FollowStatusSchema)
+async def detail_follow_status(follower_id: int, following_id: int, db: AsyncSession = Depends(get_db)):
+    return {'follower_id': follower_id, 'following_id': following_id,
+            'follows': await is_following(db, follower_id, following_id)}
 
 
 @follow_router.get('/{follow_id}/', response_model=FollowOutSchema)
-async def detail_user(follow_id: int, db: Session = Depends(get_db)):
-    follow_db = db.query(Follow).filter(Follow.id == follow_id).first()
+async def detail_user(follow_id: int, db: AsyncSession = Depends(get_db)):
+    follow_db = await db.scalar(select(Follow).where(Follow.id == follow_id))
 
     if not follow_db:
         raise HTTPException(detail='маалымат жок', status_code=400)
@@ -42,29 +121,39 @@ async def detail_user(follow_id: int, db: Session = Depends(get_db)):
 
 @follow_router.put('/{follow_id}/', response_model=dict)
 async def update_follow(follow_id: int, follow: FollowInputSchema,
-                        db: Session = Depends(get_db)):
+                        db: AsyncSession = Depends(get_db)):
 
-    follow_db = (db.query(Follow).filter(Follow.id == follow_id).first())
+    follow_db = await db.scalar(select(Follow).where(Follow.id == follow_id))
 
     if not follow_db:
         raise HTTPException(detail='Мындай follow жок',status_code=400)
 
+    if follow.follower_id == follow.following_id:
+        raise HTTPException(detail='Өзүңүзгө жазыла албайсыз', status_code=400)
+
+    old_follower_id = follow_db.follower_id
     for follow_key, follow_value in follow.dict().items():
         setattr(follow_db, follow_key, follow_value)
 
-    db.commit()
-    db.refresh(follow_db)
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(detail='Сиз буга чейин жазылгансыз', status_code=400)
+    follow_graph.forget(old_follower_id)
+    follow_graph.forget(follow.follower_id)
 
     return {'message': 'follow өзгөртүлдү'}
 
 
 @follow_router.delete('/{follow_id}/', response_model=dict)
-async def delete_follow(follow_id: int, db: Session = Depends(get_db)):
-    follow_db = (db.query(Follow).filter(Follow.id == follow_id).first())
+async def delete_follow(follow_id: int, db: AsyncSession = Depends(get_db)):
+    follow_db = await db.scalar(select(Follow).where(Follow.id == follow_id))
 
     if not follow_db:
         raise HTTPException(detail='Мындай follow жок', status_code=400)
 
-    db.delete(follow_db)
-    db.commit()
+    await db.delete(follow_db)
+    await db.commit()
+    follow_graph.forget(follow_db.follower_id)
     return {'message': 'follow өчүрүлдү'}
\ No newline at end of file
@@ -0,0 +1,126 @@
+import hashlib
+from fastapi.responses import JSONResponse
+from Duolingo.mysite.services.idempotency import (StoredResponse, reserve_idempotency_key,
+                                                  complete_idempotency_key, release_idempotency_key)
+from Duolingo.mysite.config import FORWARDED_ALLOW_IPS
+
+IDEMPOTENCY_HEADER = b'idempotency-key'
+REPLAYED_HEADER = b'idempotent-replayed'
+MAX_KEY_LENGTH = 255
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+SKIPPED_RESPONSE_HEADERS = {b'content-length', b'date', b'server'}
+# Only these writes are replayed. Responses are stored verbatim, so routes that
+# return credentials (/auth/) must never be listed here.
+IDEMPOTENT_PREFIXES = ('/follow/', '/messages/', '/chat_members/', '/add_friends/', '/lesson_completion/')
+
+
+def client_address(scope, headers: dict) -> str:
+    peer = (scope.get('client') or ('',))[0]
+    forwarded = headers.get(b'x-forwarded-for')
+    if forwarded and peer in FORWARDED_ALLOW_IPS:
+        # The proxy appends the address it saw, so the last entry is the one it vouches for.
+        return forwarded.decode('latin-1').rsplit(',', 1)[-1].strip()
+    return peer
+
+
+def scoped_key(scope, key: str) -> str:
+    # Keys are per caller and per endpoint: the same key sent by another user
+    # or to another route is a different request.
+    headers = dict(scope['headers'])
+    caller = headers.get(b'authorization') or client_address(scope, headers).encode()
+    target = scope['method'] + ' ' + scope['path'] + '?' + scope.get('query_string', b'').decode('latin-1')
+    return hashlib.sha256(caller + b'\n' + target.encode() + b'\n' + key.encode()).hexdigest()
+
+
+class IdempotencyMiddleware:
+    """Replays the stored response for a repeated ``Idempotency-Key`` instead of re-running the write.
+
+    Only unsafe methods on ``IDEMPOTENT_PREFIXES`` that carry the header are affected. The first request
+    reserves the key, runs the handler and stores its response; 5xx responses
+    and crashes release the key so the client can retry for real.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if (scope['type'] != 'http' or scope['method'] in SAFE_METHODS
+                or not scope['path'].startswith(IDEMPOTENT_PREFIXES)):
+            await self.app(scope, receive, send)
+            return
+
+        key = next((value.decode('latin-1') for name, value in scope['headers'] if name == IDEMPOTENCY_HEADER), None)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({'detail': 'Туура эмес Idempotency-Key'}, status_code=400)(scope, receive, send)
+            return
+
+        parts = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            parts.append(message.get('body', b''))
+            more_body = message.get('more_body', False)
+        body = b''.join(parts)
+
+        key = scoped_key(scope, key)
+        request_hash = hashlib.sha256(body).hexdigest()
+
+        stored = await reserve_idempotency_key(key, request_hash)
+        if stored is not None:
+            await self.answer_existing(stored, request_hash, scope, receive, send)
+            return
+
+        replayed = False
+
+        async def replay_receive():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            return await receive()
+
+        status_code, headers, chunks = None, [], []
+
+        async def capture_send(message):
+            nonlocal status_code, headers
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+                headers = [[name.decode('latin-1'), value.decode('latin-1')]
+                           for name, value in message.get('headers', [])
+                           if name.lower() not in SKIPPED_RESPONSE_HEADERS]
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except BaseException:
+            await release_idempotency_key(key)
+            raise
+
+        if status_code is None or status_code >= 500:
+            await release_idempotency_key(key)
+        else:
+            await complete_idempotency_key(key, StoredResponse(request_hash, status_code, headers, b''.join(chunks)))
+
+    async def answer_existing(self, stored: StoredResponse, request_hash: str, scope, receive, send) -> None:
+        if stored.request_hash != request_hash:
+            response = JSONResponse({'detail': 'Idempotency-Key уже использован с другим запросом'},
+                                    status_code=422)
+        elif stored.pending:
+            response = JSONResponse({'detail': 'Запрос с этим Idempotency-Key ещё выполняется'},
+                                    status_code=409, headers={'Retry-After': '1'})
+        else:
+            await send({'type': 'http.response.start', 'status': stored.status_code,
+                        'headers': [(name.encode('latin-1'), value.encode('latin-1'))
+                                    for name, value in stored.headers]
+                                   + [(b'content-length', str(len(stored.body)).encode()),
+                                      (REPLAYED_HEADER, b'true')]})
+            await send({'type': 'http.response.body', 'body': stored.body})
+            return
+
+        await response(scope, receive, send)
@@ -1,64 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from Duolingo.mysite.database.models import Language
 from Duolingo.mysite.database.schema import LanguageInputSchema, LanguageOutSchema
-from Duolingo.mysite.database.db import SessionLocal
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params
+from Duolingo.mysite.api.catalog import catalog_page, catalog_detail
+from Duolingo.mysite.services.catalog import catalog_cache
 from typing import List
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 language_router = APIRouter(prefix='/language', tags=['Language'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @language_router.post('/', response_model=LanguageOutSchema)
-async def create_language(language: LanguageInputSchema, db: Session = Depends(get_db)):
+async def create_language(language: LanguageInputSchema, db: AsyncSession = Depends(get_db)):
     language_db = Language(**language.dict())
     db.add(language_db)
-    db.commit()
-    db.refresh(language_db)
+    await db.commit()
+    catalog_cache.invalidate('language')
+    await db.refresh(language_db)
     return language_db
 
 
 @language_router.get('/', response_model=List[LanguageOutSchema])
-async def list_language(db: Session = Depends(get_db)):
-    return db.query(Language).all()
+async def list_language(response: Response,
+                        page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    return await catalog_page(db, response, 'language', LanguageOutSchema, None,
+                              select(Language), page, Language.id)
 
 
 @language_router.get('/{language_id}/', response_model=LanguageOutSchema)
-async def detail_language(language_id: int, db: Session = Depends(get_db)):
-    language_db = db.query(Language).filter(Language.id == language_id).first()
-    if not language_db:
-        raise HTTPException(detail='Мындай маалымат жок', status_code=400)
-
-    return language_db
+async def detail_language(language_id: int, db: AsyncSession = Depends(get_db)):
+    return await catalog_detail(db, 'language', LanguageOutSchema, language_id,
+                                select(Language).where(Language.id == language_id))
 
 
 @language_router.put('/{language_id}/', response_model=dict)
 async def update_language(language_id: int, language: LanguageInputSchema,
-                        db: Session = Depends(get_db)):
-    language_db = db.query(Language).filter(Language.id == language_id).first()
+                        db: AsyncSession = Depends(get_db)):
+    language_db = await db.scalar(select(Language).where(Language.id == language_id))
     if not language_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
     for language_key, language_value in language.dict().items():
         setattr(language_db, language_key, language_value)
 
-    db.commit()
-    db.refresh(language_db)
+    await db.commit()
+    catalog_cache.invalidate('language')
+    await db.refresh(language_db)
     return {'message': 'Успешно изменено'}
 
 
 @language_router.delete('/{language_id}/', response_model=dict)
-async def delete_language(language_id: int, db: Session = Depends(get_db)):
-    language_db = db.query(Language).filter(Language.id == language_id).first()
+async def delete_language(language_id: int, db: AsyncSession = Depends(get_db)):
+    language_db = await db.scalar(select(Language).where(Language.id == language_id))
     if not language_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    db.delete(language_db)
-    db.commit()
+    await db.delete(language_db)
+    await db.commit()
+    catalog_cache.invalidate('language')
     return {'message': 'Успешно удалено'}
\ No newline at end of file
@@ -0,0 +1,64 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from Duolingo.mysite.database.models import UserProfile
+from Duolingo.mysite.database.schema import LeaderboardEntrySchema
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.deps import get_current_user
+from Duolingo.mysite.api.pagination import PageParams, page_params, encode_cursor, decode_cursor, NEXT_CURSOR_HEADER
+from Duolingo.mysite.services.identity import CurrentUser
+from Duolingo.mysite.services.ranking import leaderboards
+
+leaderboard_router = APIRouter(prefix='/leaderboard', tags=['Leaderboard'])
+
+
+async def with_profiles(db: AsyncSession, entries: list) -> list:
+    # Ranks come from memory; one primary-key lookup fills in names for the page.
+    profiles = {row.id: row for row in await db.execute(
+        select(UserProfile.id, UserProfile.username, UserProfile.avatar)
+        .where(UserProfile.id.in_([user_id for _, user_id, _ in entries])))}
+
+    return [{'rank': rank, 'user_id': user_id, 'username': profiles[user_id].username,
+             'avatar': profiles[user_id].avatar, 'xp': xp}
+            for rank, user_id, xp in entries if user_id in profiles]
+
+
+@leaderboard_router.get('/', response_model=List[LeaderboardEntrySchema])
+async def list_leaderboard(response: Response, language_id: Optional[int] = None,
+                           page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    board = leaderboards.board(language_id)
+    offset = decode_cursor(page.after, (int,))[0] if page.after is not None else 0
+    if offset < 0:
+        raise HTTPException(detail='Туура эмес cursor', status_code=400)
+
+    entries = board.page(offset, page.limit)
+    if offset + page.limit < len(board):
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([offset + page.limit])
+
+    return await with_profiles(db, entries)
+
+
+@leaderboard_router.get('/me/', response_model=LeaderboardEntrySchema)
+async def my_rank(language_id: Optional[int] = None, user: CurrentUser = Depends(get_current_user),
+                  db: AsyncSession = Depends(get_db)):
+    board = leaderboards.board(language_id)
+    rank = board.rank(user.id)
+    if rank is None:
+        raise HTTPException(detail='Пользователь ещё не в рейтинге', status_code=404)
+
+    entries = await with_profiles(db, [(rank, user.id, board.score(user.id))])
+    if not entries:
+        raise HTTPException(detail='Мындай колдонуучу жок', status_code=400)
+
+    return entries[0]
+
+
+@leaderboard_router.get('/around-me/', response_model=List[LeaderboardEntrySchema])
+async def around_me(language_id: Optional[int] = None, radius: int = Query(5, ge=1, le=50),
+                    user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    entries = leaderboards.board(language_id).around(user.id, radius)
+    if not entries:
+        raise HTTPException(detail='Пользователь ещё не в рейтинге', status_code=404)
+
+    return await with_profiles(db, entries)
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date
+from Duolingo.mysite.database.models import LeagueMembership
+from Duolingo.mysite.database.schema import LeagueCohortSchema
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.deps import get_current_user
+from Duolingo.mysite.services.identity import CurrentUser
+from Duolingo.mysite.services.leagues import LEAGUE_NAMES, MAX_TIER, week_start, load_cohort
+from Duolingo.mysite.config import LEAGUE_PROMOTE_COUNT, LEAGUE_DEMOTE_COUNT
+
+league_router = APIRouter(prefix='/league', tags=['League'])
+
+
+@league_router.get('/me/', response_model=LeagueCohortSchema)
+async def my_league(user: CurrentUser = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    week = week_start(date.today())
+    membership = (await db.execute(select(LeagueMembership.tier, LeagueMembership.cohort)
+                                   .where(LeagueMembership.user_id == user.id,
+                                          LeagueMembership.week == week))).one_or_none()
+    if membership is None:
+        raise HTTPException(detail='На этой неделе вы ещё не в лиге', status_code=404)
+
+    standings = await load_cohort(db, week, membership.tier, membership.cohort)
+
+    return {'week': week, 'tier': membership.tier, 'name': LEAGUE_NAMES[membership.tier],
+            'cohort': membership.cohort,
+            'promote_count': LEAGUE_PROMOTE_COUNT if membership.tier < MAX_TIER else 0,
+            'demote_count': LEAGUE_DEMOTE_COUNT if membership.tier > 0 else 0,
+            'standings': [{'position': position, **row} for position, row in enumerate(standings, 1)]}
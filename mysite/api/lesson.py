@@ -1,64 +1,114 @@
-from fastapi import APIRouter, Depends, HTTPException
-from Duolingo.mysite.database.models import Lesson
-from Duolingo.mysite.database.schema import LessonInputSchema, LessonOutSchema
-from Duolingo.mysite.database.db import SessionLocal
-from typing import List
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Response
+from Duolingo.mysite.database.models import Lesson, Exercise
+from Duolingo.mysite.database.schema import LessonInputSchema, LessonOutSchema, LessonBundleSchema
+from Duolingo.mysite.database.db import get_db, AsyncSessionLocal
+from Duolingo.mysite.api.pagination import PageParams, page_params
+from Duolingo.mysite.api.catalog import (catalog_page, catalog_detail, lesson_content, EncodedBody,
+                                         EncodedResponse)
+from Duolingo.mysite.services.catalog import catalog_cache
+from typing import List, Optional
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import aliased, selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
 
 lesson_router = APIRouter(prefix='/lesson', tags=['Lesson'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+async def load_lesson_bundle(db: AsyncSession, lesson_id: int) -> Optional[tuple]:
+    cached = catalog_cache.get('bundle', lesson_id)
+    if cached is not None:
+        return cached
+
+    generation = catalog_cache.generation('bundle')
+    next_lesson = aliased(Lesson)
+    next_lesson_id = (select(next_lesson.id)
+                      .where(next_lesson.course_id == Lesson.course_id,
+                             tuple_(next_lesson.order, next_lesson.id) > tuple_(Lesson.order, Lesson.id))
+                      .order_by(next_lesson.order, next_lesson.id)
+                      .limit(1)
+                      .scalar_subquery())
+
+    row = (await db.execute(select(Lesson, next_lesson_id)
+                            .options(selectinload(Lesson.exercise_lesson).selectinload(Exercise.option))
+                            .where(Lesson.id == lesson_id))).first()
+    if not row:
+        return None
+
+    lesson_db, next_id = row
+    cached = (EncodedBody.build({**lesson_content(lesson_db), 'next_lesson_id': next_id}), next_id)
+    catalog_cache.set('bundle', generation, lesson_id, cached)
+    return cached
+
+
+async def prefetch_lesson_bundle(lesson_id: int) -> None:
+    if catalog_cache.get('bundle', lesson_id) is None:
+        async with AsyncSessionLocal() as db:
+            await load_lesson_bundle(db, lesson_id)
 
 @lesson_router.post('/', response_model=LessonOutSchema)
-async def create_lesson(lesson: LessonInputSchema, db: Session = Depends(get_db)):
+async def create_lesson(lesson: LessonInputSchema, db: AsyncSession = Depends(get_db)):
     lesson_db = Lesson(**lesson.dict())
     db.add(lesson_db)
-    db.commit()
-    db.refresh(lesson_db)
+    await db.commit()
+    catalog_cache.invalidate('lesson')
+    await db.refresh(lesson_db)
     return lesson_db
 
 
 @lesson_router.get('/', response_model=List[LessonOutSchema])
-async def list_lesson(db: Session = Depends(get_db)):
-    return db.query(Lesson).all()
+async def list_lesson(response: Response, course_id: Optional[int] = None,
+                      page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    if course_id is None:
+        return await catalog_page(db, response, 'lesson', LessonOutSchema, None,
+                                  select(Lesson), page, Lesson.id)
+
+    query = select(Lesson).where(Lesson.course_id == course_id)
+    return await catalog_page(db, response, 'lesson', LessonOutSchema, course_id,
+                              query, page, Lesson.order, Lesson.id)
 
 
 @lesson_router.get('/{lesson_id}/', response_model=LessonOutSchema)
-async def detail_lesson(lesson_id: int, db: Session = Depends(get_db)):
-    lesson_db = db.query(Lesson).filter(Lesson.id == lesson_id).first()
-    if not lesson_db:
+async def detail_lesson(lesson_id: int, db: AsyncSession = Depends(get_db)):
+    return await catalog_detail(db, 'lesson', LessonOutSchema, lesson_id,
+                                select(Lesson).where(Lesson.id == lesson_id))
+
+
+@lesson_router.get('/{lesson_id}/bundle', response_model=LessonBundleSchema)
+async def lesson_bundle(lesson_id: int, background_tasks: BackgroundTasks, db: AsyncSession = Depends(get_db)):
+    bundle = await load_lesson_bundle(db, lesson_id)
+    if bundle is None:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    return lesson_db
+    encoded, next_lesson_id = bundle
+    if next_lesson_id is not None:
+        background_tasks.add_task(prefetch_lesson_bundle, next_lesson_id)
+
+    return EncodedResponse(encoded)
 
 
 @lesson_router.put('/{lesson_id}/', response_model=dict)
 async def update_lesson(lesson_id: int, lesson: LessonInputSchema,
-                             db: Session = Depends(get_db)):
-    lesson_db = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+                             db: AsyncSession = Depends(get_db)):
+    lesson_db = await db.scalar(select(Lesson).where(Lesson.id == lesson_id))
     if not lesson_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
     for lesson_key, lesson_value in lesson.dict().items():
         setattr(lesson_db, lesson_key, lesson_value)
 
-    db.commit()
-    db.refresh(lesson_db)
+    await db.commit()
+    catalog_cache.invalidate('lesson')
+    await db.refresh(lesson_db)
     return {'message': 'Успешно изменено'}
 
 
 @lesson_router.delete('/{lesson_id}/', response_model=dict)
-async def delete_lesson(lesson_id: int, db: Session = Depends(get_db)):
-    lesson_db = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+async def delete_lesson(lesson_id: int, db: AsyncSession = Depends(get_db)):
+    lesson_db = await db.scalar(select(Lesson).where(Lesson.id == lesson_id))
     if not lesson_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    db.delete(lesson_db)
-    db.commit()
+    await db.delete(lesson_db)
+    await db.commit()
+    catalog_cache.invalidate('lesson')
     return {'message': 'Успешно удалено'}
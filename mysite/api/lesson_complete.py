@@ -1,84 +1,305 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
-from Duolingo.mysite.database.models import LessonCompletion, Lesson, LanguageProgress, UserProfile, Streak
-from Duolingo.mysite.database.schema import LessonCompletionInputSchema, CompleteLessonResponseSchema
-from Duolingo.mysite.database.db import SessionLocal
+from sqlalchemy import select, func, exists, and_, or_, case
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from typing import List, Optional
+from collections import defaultdict
+from Duolingo.mysite.database.models import (LessonCompletion, Lesson, Course, LanguageProgress, Streak,
+                                             CourseProgress, UserProfile, LeagueRun)
+from Duolingo.mysite.database.schema import (LessonCompletionInputSchema, CompleteLessonResponseSchema,
+                                             CourseProgressOutSchema, LessonCompletionBatchInputSchema,
+                                             LessonCompletionBatchResponseSchema)
+from Duolingo.mysite.database.db import get_db
 from Duolingo.mysite.api.deps import get_current_user
-from Duolingo.mysite.api.achievement import give_achievement_if_not_exists
-from datetime import date, timedelta
+from Duolingo.mysite.services.identity import CurrentUser
+from Duolingo.mysite.services.events import record_xp, record_activity
+from Duolingo.mysite.services.ranking import leaderboards
+from Duolingo.mysite.services.leagues import add_league_xp, league_xp_cte, week_start, cohort_standings
+from Duolingo.mysite.services.streaks import streak_day
+from Duolingo.mysite.config import OFFLINE_COMPLETION_WINDOW
+from datetime import date, datetime, timedelta, timezone
 
 lesson_completion_router = APIRouter(prefix='/lesson_completion', tags=['Lesson Completion'])
 
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def lesson_state_query(user_id: int, lesson_id: int):
+    prev_lesson = aliased(Lesson)
+
+    prev_order = (select(func.max(prev_lesson.order))
+                  .where(prev_lesson.course_id == Lesson.course_id, prev_lesson.order < Lesson.order)
+                  .scalar_subquery())
+
+    return (select(Lesson.id, Lesson.course_id, Lesson.order, Lesson.is_locked, Lesson.xp_reward,
+                   Course.language_id, prev_order.label('prev_order'),
+                   exists().where(LessonCompletion.user_id == user_id,
+                                  LessonCompletion.lesson_id == Lesson.id).label('completed'),
+                   CourseProgress.completed_order)
+            .join(Course, Course.id == Lesson.course_id)
+            .outerjoin(CourseProgress, and_(CourseProgress.user_id == user_id,
+                                            CourseProgress.course_id == Lesson.course_id))
+            .where(Lesson.id == lesson_id))
+
+
+def streak_upsert(user_id: int, day: date):
+    """Counts a lesson on ``day`` toward the user's streak, creating the row on the first lesson.
+
+    A day before the row's last activity leaves it unchanged, so offline
+    completions can be replayed in any order after newer ones.
+    """
+    return (insert(Streak)
+            .values(user_id=user_id, current_streak=1, last_activity=day)
+            .on_conflict_do_update(constraint='uq_streak_user',
+                                   set_={'current_streak': case(
+                                             (Streak.last_activity >= day, Streak.current_streak),
+                                             (Streak.last_activity == day - timedelta(days=1),
+                                              Streak.current_streak + 1),
+                                             else_=1),
+                                         'last_activity': func.greatest(Streak.last_activity, day)})
+            .returning(Streak.current_streak))
 
 
 @lesson_completion_router.post('/lesson_completion/', response_model=CompleteLessonResponseSchema)
-async def complete_lesson(lesson_complete: LessonCompletionInputSchema, db: Session = Depends(get_db),
-                          user: UserProfile = Depends(get_current_user)):
-    lesson = db.query(Lesson).filter(Lesson.id == lesson_complete.lesson_id).first()
+async def complete_lesson(lesson_complete: LessonCompletionInputSchema, db: AsyncSession = Depends(get_db),
+                          user: CurrentUser = Depends(get_current_user)):
+    lesson = (await db.execute(lesson_state_query(user.id, lesson_complete.lesson_id))).first()
     if not lesson:
         raise HTTPException(status_code=404, detail='Урок не найден')
 
-    if lesson.is_locked:
-        raise HTTPException(status_code=400, detail='Урок заблокирован')
+    if lesson.completed:
+        raise HTTPException(status_code=400, detail='Урок уже завершён')
+
+    # Unlock state is per user: a lesson opens once the lesson ordered right
+    # before it in the course is within the user's completed_order.
+    if lesson.prev_order is not None and lesson.prev_order > (lesson.completed_order or 0):
+        if lesson.is_locked:
+            raise HTTPException(status_code=400, detail='Урок заблокирован')
 
-    exists = db.query(LessonCompletion).filter(LessonCompletion.user_id == user.id,LessonCompletion.lesson_id == lesson.id).first()
-    if exists:
+        raise HTTPException(status_code=400, detail='Сначала пройди предыдущий урок')
+
+    completion_id = await db.scalar(insert(LessonCompletion)
+                                    .values(user_id=user.id, lesson_id=lesson.id)
+                                    .on_conflict_do_nothing(constraint='user_lesson_unique')
+                                    .returning(LessonCompletion.id))
+    if completion_id is None:
         raise HTTPException(status_code=400, detail='Урок уже завершён')
 
-    course_id = lesson.course_id
-    language_id = lesson.course_lesson.language_id
+    # The level-up is computed inside the upsert from the row's current values, so
+    # concurrent completions for the same language never overwrite each other's XP.
+    level, experience = LanguageProgress.gain_experience(1, 0, 100, lesson.xp_reward)
+    progress_cte = (insert(LanguageProgress)
+                    .values(user_id=user.id, language_id=lesson.language_id,
+                            level=level, experience=experience, max_level=100)
+                    .on_conflict_do_update(constraint='uq_user_language',
+                                           set_={**LanguageProgress.gain_experience_sql(lesson.xp_reward),
+                                                 'updated_at': func.localtimestamp()})
+                    .returning(LanguageProgress.level, LanguageProgress.experience)
+                    .cte('progress'))
+
+    streak_cte = streak_upsert(user.id, streak_day(datetime.utcnow())).cte('streak')
+
+    course_upsert = insert(CourseProgress).values(user_id=user.id, course_id=lesson.course_id,
+                                                  completed_order=lesson.order)
+    course_cte = (course_upsert
+                  .on_conflict_do_update(constraint='uq_user_course',
+                                         set_={'completed_order': func.greatest(
+                                             CourseProgress.completed_order, course_upsert.excluded.completed_order)})
+                  .cte('course_progress'))
+
+    week = week_start(date.today())
+    league_cte = league_xp_cte(user.id, lesson.xp_reward, week)
+
+    write = (select(progress_cte.c.level, progress_cte.c.experience, streak_cte.c.current_streak,
+                    league_cte.c.tier, league_cte.c.cohort, league_cte.c.xp.label('league_xp'))
+             .add_cte(course_cte, UserProfile.bump_version(user.id).cte('profile_version')))
+
+    result = (await db.execute(write)).one()
+    await db.commit()
+
+    cohort_standings.record(week, result.tier, result.cohort, user.id, result.league_xp)
+    leaderboards.set_progress(user.id, lesson.language_id,
+                              LanguageProgress.total_experience(result.level, result.experience))
+    record_xp(user.id, lesson.xp_reward, f'lesson:{lesson.id}')
+    record_activity(user.id, 'lesson_completed', lesson_id=lesson.id, xp=lesson.xp_reward)
+
+    return {'completion': {'id': completion_id, 'user_id': user.id, 'lesson_id': lesson.id},
+            'level': result.level, 'experience': result.experience,
+            'xp_to_next_level': LanguageProgress.xp_to_next(result.level, result.experience),
+            'streak': result.current_streak}
+
+
+def client_time(value: datetime, now: datetime) -> Optional[datetime]:
+    """Naive UTC completion time, clamped to ``now``; None if outside the offline window."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    if value < now - timedelta(seconds=OFFLINE_COMPLETION_WINDOW):
+        return None
+    return min(value, now)
+
+
+@lesson_completion_router.post('/batch/', response_model=LessonCompletionBatchResponseSchema)
+async def complete_lesson_batch(batch: LessonCompletionBatchInputSchema, db: AsyncSession = Depends(get_db),
+                                user: CurrentUser = Depends(get_current_user)):
+    """Replays lessons completed offline, in the order the client sent them.
+
+    The unlock chain is checked in memory against one snapshot of the user's
+    progress, and all accepted items are written with a fixed number of
+    statements, whatever the size of the batch.
+    """
+    lesson_ids = {item.lesson_id for item in batch.items}
+    keys = {item.idempotency_key for item in batch.items}
+
+    course_ids = select(Lesson.course_id).where(Lesson.id.in_(lesson_ids))
+    course_lessons = (await db.execute(select(Lesson.id, Lesson.course_id, Lesson.order, Lesson.xp_reward,
+                                              Course.language_id)
+                                       .join(Course, Course.id == Lesson.course_id)
+                                       .where(Lesson.course_id.in_(course_ids))
+                                       .order_by(Lesson.course_id, Lesson.order, Lesson.id))).all()
+    lessons = {lesson.id: lesson for lesson in course_lessons}
+
+    prev_order, previous = {}, {}
+    for lesson in course_lessons:
+        current, before = previous.get(lesson.course_id, (None, None))
+        if lesson.order != current:
+            current, before = lesson.order, current
+            previous[lesson.course_id] = (current, before)
+        prev_order[lesson.id] = before
+
+    known = (await db.execute(select(LessonCompletion.id, LessonCompletion.lesson_id, LessonCompletion.client_key)
+                              .where(LessonCompletion.user_id == user.id,
+                                     or_(LessonCompletion.lesson_id.in_(lesson_ids),
+                                         LessonCompletion.client_key.in_(keys))))).all()
+    completed = {row.lesson_id for row in known}
+    applied = {row.client_key: row.id for row in known if row.client_key is not None}
+
+    completed_order = dict((await db.execute(select(CourseProgress.course_id, CourseProgress.completed_order)
+                                             .where(CourseProgress.user_id == user.id,
+                                                    CourseProgress.course_id.in_(course_ids)))).all())
+
+    now = datetime.utcnow()
+    results, accepted, rows, first, repeats = [], [], [], {}, []
+    for item in batch.items:
+        result = {'idempotency_key': item.idempotency_key, 'lesson_id': item.lesson_id}
+        results.append(result)
+        lesson = lessons.get(item.lesson_id)
+        completed_at = client_time(item.completed_at, now)
+
+        if item.idempotency_key in applied:
+            result.update(status='duplicate', completion_id=applied[item.idempotency_key])
+        elif item.idempotency_key in first:
+            # Resolved below from the first occurrence; a repeat is never completed a second time.
+            repeats.append(result)
+            continue
+        elif lesson is None:
+            result['status'] = 'not_found'
+        elif completed_at is None:
+            result['status'] = 'too_old'
+        elif lesson.id in completed:
+            result['status'] = 'already_completed'
+        elif (prev_order[lesson.id] is not None
+              and prev_order[lesson.id] > completed_order.get(lesson.course_id, 0)):
+            result['status'] = 'locked'
+        else:
+            result['status'] = 'completed'
+            completed.add(lesson.id)
+            completed_order[lesson.course_id] = max(completed_order.get(lesson.course_id, 0), lesson.order)
+            accepted.append(result)
+            rows.append({'user_id': user.id, 'lesson_id': lesson.id, 'client_key': item.idempotency_key,
+                         'date_completed': completed_at})
+        first[item.idempotency_key] = result
 
-    if lesson.order > 1:
-        prev_lesson = db.query(Lesson).filter(Lesson.course_id == course_id, Lesson.order == lesson.order - 1).first()
+    inserted = {}
+    if rows:
+        inserted = dict((await db.execute(insert(LessonCompletion)
+                                          .values(rows)
+                                          .on_conflict_do_nothing()
+                                          .returning(LessonCompletion.client_key, LessonCompletion.id))).all())
 
-        if not prev_lesson:
-            raise HTTPException(status_code=400, detail='Предыдущий урок не найден')
+    xp, weekly, orders, days, awarded = defaultdict(int), defaultdict(int), {}, [], []
+    for result, row in zip(accepted, rows):
+        if row['client_key'] not in inserted:
+            result['status'] = 'already_completed'
+            continue
 
-        prev_completed = db.query(LessonCompletion).filter(LessonCompletion.user_id == user.id, LessonCompletion.lesson_id == prev_lesson.id).first()
+        lesson = lessons[row['lesson_id']]
+        result['completion_id'] = inserted[row['client_key']]
+        xp[lesson.language_id] += lesson.xp_reward
+        orders[lesson.course_id] = max(orders.get(lesson.course_id, 0), lesson.order)
+        day = streak_day(row['date_completed'])
+        days.append(day)
+        weekly[week_start(day)] += lesson.xp_reward
+        awarded.append(lesson)
 
-        if not prev_completed:
-            raise HTTPException(status_code=400, detail='Сначала пройди предыдущий урок')
+    for result in repeats:
+        original = first[result['idempotency_key']]
+        result.update(lesson_id=original['lesson_id'], status='duplicate',
+                      completion_id=original.get('completion_id'))
 
-    completion = LessonCompletion(user_id=user.id, lesson_id=lesson.id)
-    db.add(completion)
-    db.flush()
+    levels = []
+    for language_id, gained in xp.items():
+        level, experience = LanguageProgress.gain_experience(1, 0, 100, gained)
+        progress = (await db.execute(insert(LanguageProgress)
+                                     .values(user_id=user.id, language_id=language_id,
+                                             level=level, experience=experience, max_level=100)
+                                     .on_conflict_do_update(constraint='uq_user_language',
+                                                            set_={**LanguageProgress.gain_experience_sql(gained),
+                                                                  'updated_at': func.localtimestamp()})
+                                     .returning(LanguageProgress.id, LanguageProgress.level,
+                                                LanguageProgress.experience))).one()
+        levels.append({'id': progress.id, 'language_id': language_id, 'level': progress.level,
+                       'experience': progress.experience,
+                       'xp_to_next_level': LanguageProgress.xp_to_next(progress.level, progress.experience)})
 
-    progress = db.query(LanguageProgress).filter(LanguageProgress.user_id == user.id, LanguageProgress.language_id == language_id).first()
+    if orders:
+        course_upsert = insert(CourseProgress).values([{'user_id': user.id, 'course_id': course_id,
+                                                        'completed_order': order}
+                                                       for course_id, order in orders.items()])
+        await db.execute(course_upsert.on_conflict_do_update(
+            constraint='uq_user_course',
+            set_={'completed_order': func.greatest(CourseProgress.completed_order,
+                                                   course_upsert.excluded.completed_order)}))
 
-    if not progress:
-        progress = LanguageProgress(user_id=user.id, language_id=language_id)
-        db.add(progress)
-        db.flush()
+    # The same upsert as a single completion, once per distinct day in date order.
+    streak = None
+    for day in sorted(set(days)):
+        streak = await db.scalar(streak_upsert(user.id, day))
+    if not days:
+        streak = await db.scalar(select(Streak.current_streak).where(Streak.user_id == user.id))
 
-    progress.add_experience(lesson.xp_reward)
+    if awarded:
+        await db.execute(UserProfile.bump_version(user.id))
 
-    next_lesson = db.query(Lesson).filter(Lesson.course_id == lesson.course_id, Lesson.order == lesson.order + 1).first()
+    # League XP counts toward the week the lesson was completed in, unless the
+    # close job has already started on that week; then it goes to this week.
+    current_week = week_start(date.today())
+    closed = set()
+    if weekly:
+        closed = set((await db.scalars(select(LeagueRun.week).where(LeagueRun.week.in_(weekly)))).all())
+    league_xp = defaultdict(int)
+    for week, gained in weekly.items():
+        league_xp[current_week if week in closed or week > current_week else week] += gained
+    leagues = [await add_league_xp(db, user.id, gained, day=week) for week, gained in sorted(league_xp.items())]
+    await db.commit()
 
-    if next_lesson:
-        next_lesson.is_locked = False
-        db.add(next_lesson)
+    for week, tier, cohort, total in leagues:
+        cohort_standings.record(week, tier, cohort, user.id, total)
 
-    streak = db.query(Streak).filter(Streak.user_id == user.id).first()
+    for progress in levels:
+        leaderboards.set_progress(user.id, progress['language_id'],
+                                  LanguageProgress.total_experience(progress['level'], progress['experience']))
+    # Only rows the INSERT actually returned earned XP, so only they are logged.
+    for lesson in awarded:
+        record_xp(user.id, lesson.xp_reward, f'lesson:{lesson.id}')
+        record_activity(user.id, 'lesson_completed', lesson_id=lesson.id, xp=lesson.xp_reward, offline=True)
 
-    if not streak:
-        streak = Streak(usser_id=user.id, current_streak=0)
-        db.add(streak)
-        db.flush()
+    return {'results': results, 'levels': levels, 'streak': streak or 0}
 
-    current_streak = streak.current_streak
 
-    db.commit()
-    db.refresh(completion)
-    db.refresh(progress)
+@lesson_completion_router.get('/course/{course_id}/', response_model=CourseProgressOutSchema)
+async def detail_course_progress(course_id: int, db: AsyncSession = Depends(get_db),
+                                 user: CurrentUser = Depends(get_current_user)):
+    completed_order = await db.scalar(select(CourseProgress.completed_order)
+                                      .where(CourseProgress.user_id == user.id,
+                                             CourseProgress.course_id == course_id))
 
-    return {'completion': {'id': completion.id, 'user_id': completion.user_id, 'lesson_id': completion.lesson_id},
-            'level': progress.level, 'experience': progress.experience, 'xp_to_next_level': progress.xp_to_next_level,
-            'streak': streak.current_streak}
\ No newline at end of file
+    return {'course_id': course_id, 'completed_order': completed_order or 0}
@@ -1,36 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from Duolingo.mysite.database.models import MaxFollow
 from Duolingo.mysite.database.schema import MaxFollowOutSchema, MaxFollowInputSchema
-from Duolingo.mysite.database.db import SessionLocal
-from sqlalchemy.orm import Session
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 max_follow_router = APIRouter(prefix='/max_follow', tags=['Max Follow'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @max_follow_router.post('/', response_model=MaxFollowOutSchema)
-async def create_max_follow(max_follow: MaxFollowInputSchema, db: Session = Depends(get_db)):
+async def create_max_follow(max_follow: MaxFollowInputSchema, db: AsyncSession = Depends(get_db)):
     max_follow_db = MaxFollow(**max_follow.dict())
     db.add(max_follow_db)
-    db.commit()
-    db.refresh(max_follow_db)
+    await db.commit()
+    await db.refresh(max_follow_db)
     return max_follow_db
 
 @max_follow_router.get('/', response_model=List[MaxFollowOutSchema])
-async def list_max_follow(db: Session = Depends(get_db)):
-    return db.query(MaxFollow).all()
+async def list_max_follow(response: Response,
+                          page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    return await paginate(db, select(MaxFollow), page, response, MaxFollow.id)
 
 
 @max_follow_router.get('/{max_follow_id}/', response_model=MaxFollowOutSchema)
-async def detail_max_follow(max_follow_id: int, db: Session = Depends(get_db)):
-    max_follow_db = db.query(MaxFollow).filter(MaxFollow.id == max_follow_id).first()
+async def detail_max_follow(max_follow_id: int, db: AsyncSession = Depends(get_db)):
+    max_follow_db = await db.scalar(select(MaxFollow).where(MaxFollow.id == max_follow_id))
     if not max_follow_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
@@ -38,25 +33,25 @@ async def detail_max_follow(max_follow_id: int, db: Session = Depends(get_db)):
 
 
 @max_follow_router.put('/{max_follow_id}/', response_model=dict)
-async def detail_max_follow(max_follow_id: int, max_follow: MaxFollowInputSchema, db: Session = Depends(get_db)):
-    max_follow_db = db.query(MaxFollow).filter(MaxFollow.id == max_follow_id).first()
+async def detail_max_follow(max_follow_id: int, max_follow: MaxFollowInputSchema, db: AsyncSession = Depends(get_db)):
+    max_follow_db = await db.scalar(select(MaxFollow).where(MaxFollow.id == max_follow_id))
     if not max_follow_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
     for max_follow_key, max_follow_value in max_follow.dict().items():
         setattr(max_follow_db, max_follow_key, max_follow_value)
 
-    db.commit()
-    db.refresh(max_follow_db)
+    await db.commit()
+    await db.refresh(max_follow_db)
     return {'message': 'Успешно изменено'}
 
 
 @max_follow_router.delete('/{max_follow_id}/', response_model=dict)
-async def detail_max_follow(max_follow_id: int, db: Session = Depends(get_db)):
-    max_follow_db = db.query(MaxFollow).filter(MaxFollow.id == max_follow_id).first()
+async def detail_max_follow(max_follow_id: int, db: AsyncSession = Depends(get_db)):
+    max_follow_db = await db.scalar(select(MaxFollow).where(MaxFollow.id == max_follow_id))
     if not max_follow_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    db.delete(max_follow_db)
-    db.commit()
+    await db.delete(max_follow_db)
+    await db.commit()
     return {'message': 'Успешно удалено'}
\ No newline at end of file
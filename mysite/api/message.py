@@ -1,37 +1,37 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from Duolingo.mysite.database.models import Message
 from Duolingo.mysite.database.schema import MessageInputSchema, MessageOutShema
-from Duolingo.mysite.database.db import SessionLocal
-from typing import List
-from sqlalchemy.orm import Session
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
+from Duolingo.mysite.services.chat_broker import chat_broker
+from typing import List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 message_router = APIRouter(prefix='/messages', tags=['Messages'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 @message_router.post('/', response_model=MessageOutShema)
-async def create_message(message: MessageInputSchema, db: Session = Depends(get_db)):
+async def create_message(message: MessageInputSchema, db: AsyncSession = Depends(get_db)):
     message_db = Message(**message.dict())
     db.add(message_db)
-    db.commit()
-    db.refresh(message_db)
+    await db.flush()
+    await chat_broker.publish(db, message_db)
+    await db.commit()
     return message_db
 
 
 @message_router.get('/', response_model=List[MessageOutShema])
-async def list_message(db: Session = Depends(get_db)):
-    return db.query(Message).all()
+async def list_message(response: Response, chat_id: Optional[int] = None,
+                       page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    query = select(Message)
+    if chat_id is not None:
+        query = query.where(Message.chat_id == chat_id)
+    return await paginate(db, query, page, response, Message.id)
 
 
 @message_router.get('/{message_id}/', response_model=MessageOutShema)
-async def detail_message(message_id: int, db: Session = Depends(get_db)):
-    message_db = db.query(Message).filter(Message.id == message_id).first()
+async def detail_message(message_id: int, db: AsyncSession = Depends(get_db)):
+    message_db = await db.scalar(select(Message).where(Message.id == message_id))
     if not message_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
@@ -40,24 +40,24 @@ async def detail_message(message_id: int, db: Session = Depends(get_db)):
 
 @message_router.put('/{message_id}/', response_model=dict)
 async def update_message(message_id: int, message: MessageInputSchema,
-                         db: Session = Depends(get_db)):
-    message_db = db.query(Message).filter(Message.id == message_id).first()
+                         db: AsyncSession = Depends(get_db)):
+    message_db = await db.scalar(select(Message).where(Message.id == message_id))
     if not message_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
     for message_key, message_value in message.dict().items():
         setattr(message_db, message_key, message_value)
-    db.commit()
-    db.refresh(message_db)
+    await db.commit()
+    await db.refresh(message_db)
     return {'massage': 'Успешно изменено'}
 
 
 @message_router.delete('/{message_id}/', response_model=dict)
-async def delete_message(message_id: int, db: Session = Depends(get_db)):
-    message_db = db.query(Message).filter(Message.id == message_id).first()
+async def delete_message(message_id: int, db: AsyncSession = Depends(get_db)):
+    message_db = await db.scalar(select(Message).where(Message.id == message_id))
     if not message_db:
         raise HTTPException(detail='Мындай маалымат жок', status_code=400)
 
-    db.delete(message_db)
-    db.commit()
+    await db.delete(message_db)
+    await db.commit()
     return {'massage': 'Успешно удалено'}
@@ -0,0 +1,135 @@
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from Duolingo.mysite.database.models import Course, Lesson, Exercise
+from Duolingo.mysite.database.schema import CourseOutSchema
+from Duolingo.mysite.api.catalog import dump, lesson_content
+from Duolingo.mysite.services.catalog import catalog_cache
+from Duolingo.mysite.config import MEDIA_ROOT
+
+PACK_FORMAT = 1
+PACKS_DIR = os.path.join(MEDIA_ROOT, 'packs')
+
+_build_locks: dict[int, asyncio.Lock] = {}
+
+
+@dataclass(frozen=True)
+class CoursePack:
+    course_id: int
+    version: str
+
+    @property
+    def directory(self) -> str:
+        return os.path.join(PACKS_DIR, f'course-{self.course_id}')
+
+    def relative_path(self, base: Optional[str] = None) -> str:
+        name = f'{self.version}.json.gz' if base is None else f'{base}-{self.version}.delta.json.gz'
+        return f'course-{self.course_id}/{name}'
+
+    def path(self, base: Optional[str] = None) -> str:
+        return os.path.join(PACKS_DIR, self.relative_path(base))
+
+    def manifest_path(self, version: Optional[str] = None) -> str:
+        return os.path.join(self.directory, f'{version or self.version}.manifest.json')
+
+
+def canonical(content) -> bytes:
+    return json.dumps(content, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode()
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    # A unique temp name per call: concurrent writers of the same file each replace it whole.
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        # mkstemp creates 0600; packs may be served straight from MEDIA_ROOT.
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def write_pack(pack: CoursePack, content: dict, manifest: dict) -> None:
+    if not os.path.exists(pack.path()):
+        write_atomic(pack.path(), gzip.compress(canonical(content), compresslevel=9, mtime=0))
+    if not os.path.exists(pack.manifest_path()):
+        write_atomic(pack.manifest_path(), canonical(manifest))
+
+
+def write_delta(pack: CoursePack, base: str) -> bool:
+    """Writes the lessons added or changed since ``base``; False if ``base`` is unknown."""
+    if os.path.exists(pack.path(base)):
+        return True
+
+    try:
+        with open(pack.manifest_path(base), 'rb') as f:
+            base_manifest = json.load(f)
+    except FileNotFoundError:
+        return False
+
+    with gzip.open(pack.path(), 'rb') as f:
+        content = json.load(f)
+
+    base_lessons = base_manifest['lessons']
+    lessons = [lesson for lesson in content['lessons']
+               if base_lessons.get(str(lesson['id'])) != lesson_hash(lesson)]
+    order = [lesson['id'] for lesson in content['lessons']]
+    removed = sorted(int(lesson_id) for lesson_id in set(base_lessons) - {str(i) for i in order})
+
+    delta = {'format': PACK_FORMAT, 'base': base, 'version': pack.version, 'course': content['course'],
+             'order': order, 'lessons': lessons, 'removed': removed}
+    write_atomic(pack.path(base), gzip.compress(canonical(delta), compresslevel=9, mtime=0))
+    return True
+
+
+def lesson_hash(lesson: dict) -> str:
+    return hashlib.sha256(canonical(lesson)).hexdigest()
+
+
+async def load_course_pack(db: AsyncSession, course_id: int) -> Optional[CoursePack]:
+    """Returns the pack for the course's current content, building it on first use.
+
+    The version is the SHA-256 of the canonical pack JSON, so identical content
+    always maps to the same file and a pack is only written once per version.
+    """
+    pack = catalog_cache.get('pack', course_id)
+    if pack is not None:
+        return pack
+
+    lock = _build_locks.setdefault(course_id, asyncio.Lock())
+    async with lock:
+        pack = catalog_cache.get('pack', course_id)
+        if pack is not None:
+            return pack
+
+        generation = catalog_cache.generation('pack')
+        course = await db.scalar(select(Course).where(Course.id == course_id))
+        if not course:
+            return None
+
+        lessons = (await db.scalars(select(Lesson)
+                                    .options(selectinload(Lesson.exercise_lesson).selectinload(Exercise.option))
+                                    .where(Lesson.course_id == course_id)
+                                    .order_by(Lesson.order, Lesson.id))).all()
+
+        content = {'format': PACK_FORMAT, 'course': dump(CourseOutSchema, course),
+                   'lessons': [lesson_content(lesson) for lesson in lessons]}
+        pack = CoursePack(course_id=course_id, version=hashlib.sha256(canonical(content)).hexdigest())
+        manifest = {'version': pack.version,
+                    'lessons': {str(lesson['id']): lesson_hash(lesson) for lesson in content['lessons']}}
+
+        await asyncio.to_thread(write_pack, pack, content, manifest)
+        catalog_cache.set('pack', generation, course_id, pack)
+        return pack
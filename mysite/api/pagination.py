@@ -0,0 +1,77 @@
+import base64
+import json
+from dataclasses import dataclass
+from typing import Optional, Tuple
+from fastapi import HTTPException, Query, Response
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+
+@dataclass(frozen=True)
+class PageParams:
+    limit: int
+    after: Optional[str]
+
+
+def page_params(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                after: Optional[str] = Query(None)) -> PageParams:
+    return PageParams(limit=limit, after=after)
+
+
+def encode_cursor(values: list) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode()
+
+
+def _matches(value, expected: type) -> bool:
+    # bool is an int subclass in Python but not in Postgres, so it never stands in for a number.
+    return isinstance(value, expected) and (expected is bool or not isinstance(value, bool))
+
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> list:
+    """Decodes a cursor whose values must match ``types`` one for one, so a
+    tampered cursor is a 400 instead of a type error from the database."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        values = None
+
+    if (not isinstance(values, list) or len(values) != len(types)
+            or not all(_matches(value, expected) for value, expected in zip(values, types))):
+        raise HTTPException(detail='Туура эмес cursor', status_code=400)
+
+    return values
+
+
+def _selects_entity(stmt: Select) -> bool:
+    descriptions = stmt.column_descriptions
+    return len(descriptions) == 1 and descriptions[0]['expr'] is descriptions[0]['entity']
+
+
+async def paginate(db: AsyncSession, stmt: Select, page: PageParams, response: Response, *order_by) -> list:
+    """Keyset pagination: ``order_by`` must end with a unique column (the id).
+
+    Rows after the cursor are selected with a row-value comparison on the
+    ordering columns, so each page is an index range scan no matter how deep
+    the client has paged. The cursor for the next page is returned in the
+    X-Next-Cursor header.
+    """
+    if page.after is not None:
+        values = decode_cursor(page.after, tuple(column.type.python_type for column in order_by))
+        if len(order_by) == 1:
+            stmt = stmt.where(order_by[0] > values[0])
+        else:
+            stmt = stmt.where(tuple_(*order_by) > tuple_(*values))
+
+    result = await db.execute(stmt.order_by(*order_by).limit(page.limit + 1))
+    rows = result.scalars().all() if _selects_entity(stmt) else result.all()
+
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor([getattr(last, column.key) for column in order_by])
+
+    return rows
@@ -1,38 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from Duolingo.mysite.database.models import SuperFollow
 from Duolingo.mysite.database.schema import SuperFollowOutSchema, SuperFollowInputSchema
-from Duolingo.mysite.database.db import SessionLocal
-from sqlalchemy.orm import Session
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
 
 super_follow_router = APIRouter(prefix='/super_follow', tags=['Super Follow'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @super_follow_router.post('/', response_model=SuperFollowOutSchema)
-def create_follow(
-    follow: SuperFollowInputSchema, db: Session = Depends(get_db)):
+async def create_follow(
+    follow: SuperFollowInputSchema, db: AsyncSession = Depends(get_db)):
 
     follow = SuperFollow(**follow.dict())
     db.add(follow)
-    db.commit()
-    db.refresh(follow)
+    await db.commit()
+    await db.refresh(follow)
     return follow
 
 
 @super_follow_router.get('/', response_model=List[SuperFollowOutSchema])
-async def list_super_follow(db: Session = Depends(get_db)):
-    return db.query(SuperFollow).all()
+async def list_super_follow(response: Response,
+                            page: PageParams = Depends(page_params), db: AsyncSession = Depends(get_db)):
+    return await paginate(db, select(SuperFollow), page, response, SuperFollow.id)
 
 
 @super_follow_router.get('/{super_follow_id}/', response_model=SuperFollowOutSchema)
-async def detail_user(super_follow_id: int, db: Session = Depends(get_db)):
-    super_follow_db = db.query(SuperFollow).filter(SuperFollow.id == super_follow_id).first()
+async def detail_user(super_follow_id: int, db: AsyncSession = Depends(get_db)):
+    super_follow_db = await db.scalar(select(SuperFollow).where(SuperFollow.id == super_follow_id))
 
     if not super_follow_db:
         raise HTTPException(detail='маалымат жок', status_code=400)
@@ -42,9 +38,9 @@ async def detail_user(super_follow_id: int, db: Session = Depends(get_db)):
 
 @super_follow_router.put('/{super_follow_id}/', response_model=dict)
 async def update_super_follow(follow_id: int, follow: SuperFollowInputSchema,
-                             db: Session = Depends(get_db)):
+                             db: AsyncSession = Depends(get_db)):
 
-    follow_db = (db.query(SuperFollow).filter(SuperFollow.id == follow_id).first())
+    follow_db = await db.scalar(select(SuperFollow).where(SuperFollow.id == follow_id))
 
     if not follow_db:
         raise HTTPException(detail='Мындай follow жок',status_code=400)
@@ -52,19 +48,19 @@ async def update_super_follow(follow_id: int, follow: SuperFollowInputSchema,
     for follow_key, follow_value in follow.dict().items():
         setattr(follow_db, follow_key, follow_value)
 
-    db.commit()
-    db.refresh(follow_db)
+    await db.commit()
+    await db.refresh(follow_db)
 
     return {'message': 'SuperFollow өзгөртүлдү'}
 
 
 @super_follow_router.delete('/{super_follow_id}/', response_model=dict)
-async def delete_follow(follow_id: int, db: Session = Depends(get_db)):
-    follow_db = (db.query(SuperFollow).filter(SuperFollow.id == follow_id).first())
+async def delete_follow(follow_id: int, db: AsyncSession = Depends(get_db)):
+    follow_db = await db.scalar(select(SuperFollow).where(SuperFollow.id == follow_id))
 
     if not follow_db:
         raise HTTPException(detail='Мындай follow жок', status_code=400)
 
-    db.delete(follow_db)
-    db.commit()
+    await db.delete(follow_db)
+    await db.commit()
     return {'message': 'follow өчүрүлдү'}
\ No newline at end of file
@@ -1,62 +1,103 @@
-from fastapi import APIRouter, Depends, HTTPException
-from Duolingo.mysite.database.models import UserProfile
+from fastapi import APIRouter, Depends, HTTPException, Header, Response
+from Duolingo.mysite.database.models import UserProfile, UserAchievement, Achievement, LanguageProgress, Streak
 from Duolingo.mysite.database.schema import (UserProfileInputSchema, UserProfileOutSchema, UserListSchema,
                                              UserProfileListSchema, UserProfileDetailSchema)
-from Duolingo.mysite.database.db import SessionLocal
-from sqlalchemy.orm import Session
-from typing import List
+from Duolingo.mysite.database.db import get_db
+from Duolingo.mysite.api.pagination import PageParams, page_params, paginate
+from Duolingo.mysite.api.etag import version_etag, etag_matches, not_modified
+from Duolingo.mysite.services.identity import forget_user
+from Duolingo.mysite.services.ranking import leaderboards
+from Duolingo.mysite.services.streaks import streak_day
+from Duolingo.mysite.config import PROFILE_CACHE_CONTROL
+from sqlalchemy import select, func, case
+from sqlalchemy.dialects.postgresql import JSON, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from typing import List, Optional
 
 user_router = APIRouter(prefix='/users', tags=['Users'])
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+def streak_column(today: date):
+    # A streak not extended since before yesterday reads as 0 before the rollover job resets it,
+    # so the payload depends only on the stored rows and the day.
+    streak = case((Streak.last_activity >= today - timedelta(days=1), Streak.current_streak), else_=0)
+    return func.coalesce(select(streak)
+                         .where(Streak.user_id == UserProfile.id)
+                         .scalar_subquery(), 0).label('streak')
+
+
+def max_level_column():
+    return func.coalesce(select(func.max(LanguageProgress.level))
+                         .where(LanguageProgress.user_id == UserProfile.id)
+                         .scalar_subquery(), 1).label('level')
 
-@user_router.get('/', response_model=List[UserProfileListSchema])
-async def list_user(db: Session = Depends(get_db)):
-    users = db.query(UserProfile).all()
 
-    result = []
+def levels_column():
+    level = func.json_build_object('id', LanguageProgress.id, 'language_id', LanguageProgress.language_id,
+                                   'level', LanguageProgress.level, 'experience', LanguageProgress.experience)
+    return (select(func.json_agg(aggregate_order_by(level, LanguageProgress.language_id), type_=JSON))
+            .where(LanguageProgress.user_id == UserProfile.id)
+            .scalar_subquery().label('levels'))
 
-    for user in users:
-        streak = user.user_streak[0].current_streak if user.user_streak else 0
 
-    max_level = max((lvl.level for lvl in user.lesson_user), default=1)
+def achievements_column():
+    achievement = func.json_build_object('id', Achievement.id, 'title', Achievement.title)
+    return (select(func.json_agg(aggregate_order_by(achievement, UserAchievement.date_received), type_=JSON))
+            .join(Achievement, Achievement.id == UserAchievement.achievement_id)
+            .where(UserAchievement.user_id == UserProfile.id)
+            .scalar_subquery().label('achievements'))
 
-    result.append({'id': user.id, 'avatar': user.avatar, 'first_name': user.first_name,
-                   'last_name': user.last_name, 'username': user.username, 'level': max_level, 'streak': streak})
 
-    return result
+@user_router.get('/', response_model=List[UserProfileListSchema])
+async def list_user(response: Response, page: PageParams = Depends(page_params),
+                    db: AsyncSession = Depends(get_db)):
+    query = select(UserProfile.id, UserProfile.avatar, UserProfile.first_name, UserProfile.last_name,
+                   UserProfile.username, max_level_column(), streak_column(streak_day(datetime.utcnow())))
+    users = await paginate(db, query, page, response, UserProfile.id)
+
+    return [user._asdict() for user in users]
 
 
 @user_router.get('/{user_id}', response_model=UserProfileDetailSchema)
-async def detail_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(UserProfile).filter(UserProfile.id == user_id).first()
+async def detail_user(user_id: int, response: Response, if_none_match: Optional[str] = Header(None),
+                      db: AsyncSession = Depends(get_db)):
+    # profile.version moves on every profile update (a trigger) and on every write to its levels,
+    # streak or achievements (UserProfile.bump_version); the day covers streaks lapsing at
+    # midnight. A matching ETag therefore needs only a PK lookup.
+    today = streak_day(datetime.utcnow())
+    if if_none_match:
+        version = await db.scalar(select(UserProfile.version).where(UserProfile.id == user_id))
+        if version is not None and etag_matches(if_none_match, version_etag(user_id, version, today)):
+            return not_modified({'ETag': version_etag(user_id, version, today),
+                                 'Cache-Control': PROFILE_CACHE_CONTROL})
+
+    user = (await db.execute(
+        select(UserProfile.id, UserProfile.version, UserProfile.avatar, UserProfile.first_name,
+               UserProfile.last_name, UserProfile.username, UserProfile.followers_count,
+               UserProfile.following_count, streak_column(today), levels_column(),
+               achievements_column())
+        .where(UserProfile.id == user_id))).first()
 
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
 
-    streak = user.user_streak[0].current_streak if user.user_streak else 0
-
-    levels = [{'id': lvl.id, 'course_id': lvl.course_id, 'level': lvl.level,
-               'experience': lvl.experience, 'xp_to_next_level': lvl.xp_to_next_level}
-        for lvl in user.lesson_user]
+    response.headers['ETag'] = version_etag(user.id, user.version, today)
+    response.headers['Cache-Control'] = PROFILE_CACHE_CONTROL
 
-    achievements = [{'id': a.achievement_user.id, 'title': a.achievement_user.title}
-        for a in user.achievement_user]
+    levels = [{**lvl, 'xp_to_next_level': LanguageProgress.xp_to_next(lvl['level'], lvl['experience'])}
+              for lvl in user.levels or []]
 
     return {'id': user.id, 'avatar': user.avatar, 'first_name': user.first_name,
-            'last_name': user.last_name, 'username': user.username, 'streak': streak,
-            'levels': levels, 'achievements': achievements}
+            'last_name': user.last_name, 'username': user.username,
+            'followers_count': user.followers_count, 'following_count': user.following_count,
+            'streak': user.streak,
+            'levels': levels, 'achievements': user.achievements or []}
 
 
 @user_router.put('/{user_id}/', response_model=dict)
-async def update_user(user_id: int, user: UserProfileInputSchema, db: Session = Depends(get_db)):
-    user_db = db.query(UserProfile).filter(UserProfile.id == user_id).first()
+async def update_user(user_id: int, user: UserProfileInputSchema, db: AsyncSession = Depends(get_db)):
+    user_db = await db.scalar(select(UserProfile).where(UserProfile.id == user_id))
 
     if not user_db:
         raise HTTPException(status_code=400, detail='Мындай колдонуучу жок')
@@ -64,20 +105,23 @@ async def update_user(user_id: int, user: UserProfileInputSchema, db: Session =
     for key, value in user.dict().items():
         setattr(user_db, key, value)
 
-    db.commit()
-    db.refresh(user_db)
+    await db.commit()
+    await db.refresh(user_db)
+    forget_user(user_id)
 
     return {'message': 'Колдонуучу өзгөртүлдү'}
 
 
 @user_router.delete('/{user_id}/', response_model=dict)
-async def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user_db = db.query(UserProfile).filter(UserProfile.id == user_id).first()
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_db)):
+    user_db = await db.scalar(select(UserProfile).where(UserProfile.id == user_id))
 
     if not user_db:
         raise HTTPException(detail='Мындай колдонуучу жок', status_code=400)
 
-    db.delete(user_db)
-    db.commit()
+    await db.delete(user_db)
+    await db.commit()
+    forget_user(user_id)
+    leaderboards.remove_user(user_id)
 
     return {'message': 'Колдонуучу өчүрүлдү'}
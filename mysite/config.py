@@ -6,3 +6,90 @@ SECRET_KEY = os.getenv('SECRET_KEY')
 ALGORITHM = 'HS256'
 ACCESS_TOKEN_LIFETIME = 30
 REFRESH_TOKEN_LIFETIME = 3
+
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 20))
+DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 30))
+DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() == 'true'
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 50000))
+TOKEN_CACHE_TTL = int(os.getenv('TOKEN_CACHE_TTL', 300))
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 20000))
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))
+
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 4))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 64))
+
+REFRESH_TOKEN_PURGE_INTERVAL = int(os.getenv('REFRESH_TOKEN_PURGE_INTERVAL', 3600))
+REFRESH_TOKEN_PURGE_BATCH = int(os.getenv('REFRESH_TOKEN_PURGE_BATCH', 5000))
+
+CATALOG_CACHE_SIZE = int(os.getenv('CATALOG_CACHE_SIZE', 10000))
+CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 3600))
+CATALOG_VERSION_POLL_INTERVAL = int(os.getenv('CATALOG_VERSION_POLL_INTERVAL', 2))
+
+CATALOG_CACHE_CONTROL = os.getenv('CATALOG_CACHE_CONTROL', 'public, max-age=60')
+PROFILE_CACHE_CONTROL = os.getenv('PROFILE_CACHE_CONTROL', 'private, no-cache')
+
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', 'media')
+PACKS_ACCEL_PREFIX = os.getenv('PACKS_ACCEL_PREFIX', '')
+
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 86400))
+IDEMPOTENCY_PENDING_TTL = int(os.getenv('IDEMPOTENCY_PENDING_TTL', 60))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', 10000))
+IDEMPOTENCY_CACHE_TTL = int(os.getenv('IDEMPOTENCY_CACHE_TTL', 600))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', 3600))
+IDEMPOTENCY_PURGE_BATCH = int(os.getenv('IDEMPOTENCY_PURGE_BATCH', 5000))
+# Peers allowed to report the real client address in X-Forwarded-For (the reverse proxy).
+FORWARDED_ALLOW_IPS = set(os.getenv('FORWARDED_ALLOW_IPS', '127.0.0.1').split(','))
+
+# Offline completions older than this are rejected instead of backfilling streaks and history.
+OFFLINE_COMPLETION_WINDOW = int(os.getenv('OFFLINE_COMPLETION_WINDOW', 72 * 3600))
+
+EVENT_FLUSH_SIZE = int(os.getenv('EVENT_FLUSH_SIZE', 500))
+EVENT_FLUSH_INTERVAL_MS = int(os.getenv('EVENT_FLUSH_INTERVAL_MS', 200))
+EVENT_MAX_PENDING = int(os.getenv('EVENT_MAX_PENDING', 50000))
+EVENT_SPOOL_DIR = os.getenv('EVENT_SPOOL_DIR', 'spool')
+
+LEADERBOARD_SYNC_INTERVAL = int(os.getenv('LEADERBOARD_SYNC_INTERVAL', 5))
+LEADERBOARD_SYNC_OVERLAP = int(os.getenv('LEADERBOARD_SYNC_OVERLAP', 30))
+LEADERBOARD_REBUILD_INTERVAL = int(os.getenv('LEADERBOARD_REBUILD_INTERVAL', 3600))
+
+LEAGUE_COHORT_SIZE = int(os.getenv('LEAGUE_COHORT_SIZE', 30))
+LEAGUE_PROMOTE_COUNT = int(os.getenv('LEAGUE_PROMOTE_COUNT', 7))
+LEAGUE_DEMOTE_COUNT = int(os.getenv('LEAGUE_DEMOTE_COUNT', 5))
+LEAGUE_BATCH_COHORTS = int(os.getenv('LEAGUE_BATCH_COHORTS', 2000))
+LEAGUE_JOB_INTERVAL = int(os.getenv('LEAGUE_JOB_INTERVAL', 300))
+LEAGUE_CACHE_SIZE = int(os.getenv('LEAGUE_CACHE_SIZE', 10000))
+LEAGUE_CACHE_TTL = int(os.getenv('LEAGUE_CACHE_TTL', 10))
+
+STREAK_ROLLOVER_INTERVAL = int(os.getenv('STREAK_ROLLOVER_INTERVAL', 3600))
+STREAK_ROLLOVER_BATCH = int(os.getenv('STREAK_ROLLOVER_BATCH', 10000))
+STREAK_ROLLOVER_TIME_BUDGET = int(os.getenv('STREAK_ROLLOVER_TIME_BUDGET', 300))
+
+STREAK_REMINDER_HOUR = int(os.getenv('STREAK_REMINDER_HOUR', 18))
+STREAK_REMINDER_BATCH = int(os.getenv('STREAK_REMINDER_BATCH', 5000))
+STREAK_REMINDER_POLL_INTERVAL = int(os.getenv('STREAK_REMINDER_POLL_INTERVAL', 60))
+
+FOLLOW_CACHE_SIZE = int(os.getenv('FOLLOW_CACHE_SIZE', 10000))
+FOLLOW_CACHE_TTL = int(os.getenv('FOLLOW_CACHE_TTL', 30))
+FOLLOW_CACHE_MAX_DEGREE = int(os.getenv('FOLLOW_CACHE_MAX_DEGREE', 5000))
+
+SUGGESTION_REFRESH_INTERVAL = int(os.getenv('SUGGESTION_REFRESH_INTERVAL', 60))
+SUGGESTION_TOP_K = int(os.getenv('SUGGESTION_TOP_K', 20))
+SUGGESTION_FANOUT_CAP = int(os.getenv('SUGGESTION_FANOUT_CAP', 200))
+SUGGESTION_MAX_AGE = int(os.getenv('SUGGESTION_MAX_AGE', 86400))
+SUGGESTION_WEIGHT_MUTUAL = float(os.getenv('SUGGESTION_WEIGHT_MUTUAL', 1.0))
+SUGGESTION_WEIGHT_COUNTRY = float(os.getenv('SUGGESTION_WEIGHT_COUNTRY', 0.5))
+SUGGESTION_WEIGHT_LANGUAGE = float(os.getenv('SUGGESTION_WEIGHT_LANGUAGE', 0.25))
+SUGGESTION_BATCH = int(os.getenv('SUGGESTION_BATCH', 2000))
+SUGGESTION_CACHE_SIZE = int(os.getenv('SUGGESTION_CACHE_SIZE', 10000))
+SUGGESTION_CACHE_TTL = int(os.getenv('SUGGESTION_CACHE_TTL', 300))
+
+# 'local' delivers within this process only; 'postgres' fans out across workers via LISTEN/NOTIFY.
+CHAT_BROKER_BACKEND = os.getenv('CHAT_BROKER_BACKEND', 'local')
+CHAT_NOTIFY_CHANNEL = os.getenv('CHAT_NOTIFY_CHANNEL', 'chat_message')
+CHAT_SEND_QUEUE_SIZE = int(os.getenv('CHAT_SEND_QUEUE_SIZE', 256))
+CHAT_BACKLOG_LIMIT = int(os.getenv('CHAT_BACKLOG_LIMIT', 200))
+CHAT_LISTEN_RETRY_DELAY = int(os.getenv('CHAT_LISTEN_RETRY_DELAY', 5))
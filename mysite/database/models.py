@@ -1,7 +1,9 @@
 from .db import Base
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import Integer, String, ForeignKey, DateTime, Date, Boolean, Text, Enum, CheckConstraint, UniqueConstraint
+from sqlalchemy import (Integer, BigInteger, Numeric, String, ForeignKey, DateTime, Date, Boolean, Text, Enum,
+                        LargeBinary, JSON, CheckConstraint, UniqueConstraint, Index, cast, func, text, update)
 from datetime import date, datetime, timedelta
+from math import isqrt
 from typing import List, Optional
 from enum import Enum as PyEnum
 
@@ -22,6 +24,11 @@ class TypeChoices(str, PyEnum):
     private = 'private'
     group = 'group'
 
+class LeagueResultChoices(str, PyEnum):
+    promoted = 'promoted'
+    stayed = 'stayed'
+    demoted = 'demoted'
+
 class Country(Base):
     __tablename__ = 'country'
 
@@ -48,6 +55,10 @@ class UserProfile(Base):
     role: Mapped[RoleChoices] = mapped_column(Enum(RoleChoices), default=RoleChoices.user)
     is_active: Mapped[bool] = mapped_column(Boolean, default=False)
     date_register: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    version: Mapped[int] = mapped_column(BigInteger, default=1, server_default='1', nullable=False)
+    # Maintained by a trigger on follow.
+    followers_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+    following_count: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
 
     country_user: Mapped[Country] = relationship(back_populates='user_country')
     following_user: Mapped[List['Follow']] = relationship(back_populates='following',
@@ -62,6 +73,11 @@ class UserProfile(Base):
                                                            cascade='all, delete-orphan')
     user_streak: Mapped[List['Streak']] = relationship(back_populates='streak_user',
                                                        cascade='all, delete-orphan')
+
+    @classmethod
+    def bump_version(cls, user_id: int):
+        """Invalidates the profile ETag after a write to its streak, levels or achievements."""
+        return update(cls).where(cls.id == user_id).values(version=cls.version + 1)
     member_user: Mapped[List['ChatMember']] = relationship(back_populates='user_member',
                                                            cascade='all, delete-orphan')
     user_add: Mapped[List['AddFriends']] = relationship(back_populates='add_user',
@@ -74,6 +90,8 @@ class UserProfile(Base):
                                                                      cascade='all, delete-orphan')
     complete_user: Mapped[List['LessonCompletion']] = relationship(back_populates='user_complete',
                                                                    cascade='all, delete-orphan')
+    course_user: Mapped[List['CourseProgress']] = relationship(back_populates='user_course',
+                                                               cascade='all, delete-orphan')
 
 
     def __repr__(self):
@@ -84,15 +102,20 @@ class RefreshToken(Base):
     __tablename__ = 'refresh_token'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'))
-    token: Mapped[str] = mapped_column(String)
+    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'), index=True)
+    token_hash: Mapped[str] = mapped_column(String(64), unique=True, index=True)
     created_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
 
     token_user: Mapped[UserProfile] = relationship(back_populates='user_token')
 
 
 class Follow(Base):
     __tablename__ = 'follow'
+    # The unique pair doubles as the (follower_id, following_id) index for followee lookups.
+    __table_args__ = (UniqueConstraint('follower_id', 'following_id', name='uq_follow_pair'),
+                      Index('ix_follow_following_id_follower_id', 'following_id', 'follower_id'),
+                      CheckConstraint('follower_id <> following_id', name='ck_follow_not_self'))
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     following_id: Mapped[int] = mapped_column(ForeignKey('profile.id'))
@@ -145,6 +168,7 @@ class Language(Base):
 
 class Course(Base):
     __tablename__ = 'course'
+    __table_args__ = (Index('ix_course_language_id_id', 'language_id', 'id'),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     language_id: Mapped[int] = mapped_column(ForeignKey('language.id'))
@@ -157,10 +181,13 @@ class Course(Base):
     language: Mapped[Language] = relationship(back_populates='course_language')
     lesson_course: Mapped[List['Lesson']] = relationship(back_populates='course_lesson',
                                                          cascade='all, delete-orphan')
+    progress_course: Mapped[List['CourseProgress']] = relationship(back_populates='course_progress',
+                                                                   cascade='all, delete-orphan')
 
 
 class Lesson(Base):
     __tablename__ = 'lesson'
+    __table_args__ = (Index('ix_lesson_course_id_order_id', 'course_id', 'order', 'id'),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     course_id: Mapped[int] = mapped_column(ForeignKey('course.id'))
@@ -180,6 +207,7 @@ class Lesson(Base):
 
 class Exercise(Base):
     __tablename__ = 'exercise'
+    __table_args__ = (Index('ix_exercise_lesson_id_id', 'lesson_id', 'id'),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     lesson_id: Mapped[int] = mapped_column(ForeignKey('lesson.id'))
@@ -229,8 +257,25 @@ class XPHistory(Base):
 
     user_history: Mapped[UserProfile] = relationship(back_populates='history_user')
 
+
+class ActivityEvent(Base):
+    __tablename__ = 'activity_event'
+    __table_args__ = (Index('ix_activity_event_user_id_id', 'user_id', 'id'),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id', ondelete='CASCADE'))
+    kind: Mapped[str] = mapped_column(String(32))
+    payload: Mapped[Optional[dict]] = mapped_column(JSON, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
 class Streak(Base):
     __tablename__ = 'streak'
+    # Only live streaks are indexed, so the rollover job scans just the rows it may still reset
+    # and the reminder job reads one day's users in user_id order with an index-only scan.
+    __table_args__ = (UniqueConstraint('user_id', name='uq_streak_user'),
+                      Index('ix_streak_live_last_activity', 'last_activity', 'user_id',
+                            postgresql_include=['current_streak'],
+                            postgresql_where=text('current_streak > 0')))
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'))
@@ -269,7 +314,7 @@ class Chat(Base):
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     type: Mapped[TypeChoices] = mapped_column(Enum(TypeChoices))
-    language_id: Mapped[int] = mapped_column(ForeignKey('language.id'))
+    language_id: Mapped[int] = mapped_column(ForeignKey('language.id'), index=True)
     create_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
@@ -281,10 +326,11 @@ class Chat(Base):
 
 class ChatMember(Base):
     __tablename__ = 'chat_member'
+    __table_args__ = (Index('ix_chat_member_chat_id_id', 'chat_id', 'id'),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     chat_id: Mapped[int] = mapped_column(ForeignKey('chat.id'))
-    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'))
+    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'), index=True)
     joined_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
 
@@ -295,6 +341,7 @@ class ChatMember(Base):
 
 class Message(Base):
     __tablename__ = 'message'
+    __table_args__ = (Index('ix_message_chat_id_id', 'chat_id', 'id'),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     chat_id: Mapped[int] = mapped_column(ForeignKey('chat.id'))
@@ -312,7 +359,7 @@ class AddFriends(Base):
     __tablename__ = 'add_friends'
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'))
+    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'), index=True)
 
     add_user: Mapped[UserProfile] = relationship(back_populates='user_add')
 
@@ -338,19 +385,24 @@ class LanguageProgress(Base):
     level: Mapped[int] = mapped_column(Integer, default=1, server_default='1', nullable=False)
     experience: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
     max_level: Mapped[int] = mapped_column(Integer, default=100, server_default='100', nullable=False)
+    # Stamped by the database clock so leaderboard sync can pick up rows written by any worker.
+    updated_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.localtimestamp(),
+                                                 onupdate=func.localtimestamp(), index=True)
 
     user_lesson: Mapped[UserProfile] = relationship(back_populates='lesson_user')
     language: Mapped[Language] = relationship(back_populates='lesson_level')
 
+    @staticmethod
+    def xp_to_next(level: int, experience: int) -> int:
+        return max(0, 100 * (level or 1) - (experience or 0))
+
     def xp_required_for_next(self) -> int:
         level = self.level or 1
         return 100 * level
 
     @property
     def xp_to_next_level(self) -> int:
-        need = self.xp_required_for_next()
-        exp = self.experience or 0
-        return max(0, need - exp)
+        return self.xp_to_next(self.level, self.experience)
 
     def add_level(self, step: int = 1) -> int:
         if self.level is None:
@@ -361,6 +413,33 @@ class LanguageProgress(Base):
         self.level = min(self.level + step, self.max_level)
         return self.level
 
+    # Reaching level L from level 1 costs 100 + 200 + ... + 100 * (L - 1) = 50 * L * (L - 1) XP,
+    # so the level for a running XP total is the largest L with 50 * L * (L - 1) <= total, i.e.
+    # (10 + sqrt(100 + 8 * total)) // 20. Both helpers below use this instead of looping level by level.
+    @staticmethod
+    def gain_experience(level: int, experience: int, max_level: int, xp: int) -> tuple:
+        total = 50 * level * (level - 1) + experience + xp
+        new_level = (10 + isqrt(max(100 + 8 * total, 0))) // 20
+        new_level = min(max(new_level, level), max(level, max_level))
+        return new_level, total - 50 * new_level * (new_level - 1)
+
+    @classmethod
+    def gain_experience_sql(cls, xp) -> dict:
+        level = cast(cls.level, BigInteger)
+        total = 50 * level * (level - 1) + cls.experience + xp
+        new_level = cast(func.floor((10 + func.sqrt(cast(100 + 8 * total, Numeric))) / 20), BigInteger)
+        new_level = func.least(func.greatest(new_level, level), func.greatest(level, cls.max_level))
+        return {'level': new_level, 'experience': total - 50 * new_level * (new_level - 1)}
+
+    @staticmethod
+    def total_experience(level: int, experience: int) -> int:
+        return 50 * level * (level - 1) + experience
+
+    @classmethod
+    def total_experience_sql(cls):
+        level = cast(cls.level, BigInteger)
+        return 50 * level * (level - 1) + cls.experience
+
     def add_experience(self, xp: int) -> None:
         if self.level is None:
             self.level = 1
@@ -369,15 +448,7 @@ class LanguageProgress(Base):
         if self.max_level is None:
             self.max_level = 100
 
-        self.experience += xp
-
-        while self.level < self.max_level:
-            need = self.xp_required_for_next()
-            if self.experience < need:
-                break
-
-            self.experience -= need
-            self.add_level(1)
+        self.level, self.experience = self.gain_experience(self.level, self.experience, self.max_level, xp)
 
 
 class LessonCompletion(Base):
@@ -387,17 +458,32 @@ class LessonCompletion(Base):
             'user_id', 'lesson_id',
             name='user_lesson_unique'
         ),
+        UniqueConstraint('user_id', 'client_key', name='uq_completion_client_key'),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'), index=True)
     lesson_id: Mapped[int] = mapped_column(ForeignKey('lesson.id'), index=True)
     date_completed: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    client_key: Mapped[Optional[str]] = mapped_column(String(64), nullable=True)
 
     user_complete: Mapped[UserProfile] = relationship(back_populates='complete_user')
     lesson_complete: Mapped[Lesson] = relationship(back_populates='complete_lesson')
 
 
+class CourseProgress(Base):
+    __tablename__ = 'course_progress'
+    __table_args__ = (UniqueConstraint('user_id', 'course_id', name='uq_user_course'),)
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id'))
+    course_id: Mapped[int] = mapped_column(ForeignKey('course.id'), index=True)
+    completed_order: Mapped[int] = mapped_column(Integer, default=0, server_default='0', nullable=False)
+
+    user_course: Mapped[UserProfile] = relationship(back_populates='course_user')
+    course_progress: Mapped[Course] = relationship(back_populates='progress_course')
+
+
 class Achievement(Base):
     __tablename__ = 'achievement'
 
@@ -419,3 +505,91 @@ class UserAchievement(Base):
 
     user_achievement: Mapped[UserProfile] = relationship(back_populates='achievement_user')
     achievement_user: Mapped[Achievement] = relationship(back_populates='user_achievement')
+
+
+class CatalogVersion(Base):
+    __tablename__ = 'catalog_version'
+
+    name: Mapped[str] = mapped_column(String(32), primary_key=True)
+    version: Mapped[int] = mapped_column(BigInteger, default=0, server_default='0', nullable=False)
+
+
+class IdempotencyRecord(Base):
+    __tablename__ = 'idempotency_key'
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    request_hash: Mapped[str] = mapped_column(String(64))
+    status_code: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    headers: Mapped[Optional[list]] = mapped_column(JSON, nullable=True)
+    body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, index=True)
+
+
+class LeagueMembership(Base):
+    __tablename__ = 'league_membership'
+    __table_args__ = (UniqueConstraint('user_id', 'week', name='uq_league_user_week'),
+                      Index('ix_league_membership_cohort', 'week', 'tier', 'cohort'))
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id', ondelete='CASCADE'))
+    week: Mapped[date] = mapped_column(Date)
+    tier: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    cohort: Mapped[int] = mapped_column(Integer)
+    xp: Mapped[int] = mapped_column(Integer, default=0, server_default='0')
+    position: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    result: Mapped[Optional[LeagueResultChoices]] = mapped_column(Enum(LeagueResultChoices), nullable=True)
+
+
+class LeagueSeat(Base):
+    """Seats handed out so far in one (week, tier); seat ``n`` belongs to cohort ``n // LEAGUE_COHORT_SIZE``."""
+    __tablename__ = 'league_seat'
+
+    week: Mapped[date] = mapped_column(Date, primary_key=True)
+    tier: Mapped[int] = mapped_column(Integer, primary_key=True)
+    seats: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class LeagueRun(Base):
+    __tablename__ = 'league_run'
+
+    week: Mapped[date] = mapped_column(Date, primary_key=True)
+    phase: Mapped[str] = mapped_column(String(16), default='rank')
+    tier: Mapped[int] = mapped_column(Integer, default=0)
+    cohort: Mapped[int] = mapped_column(Integer, default=0)
+    ranked_rows: Mapped[int] = mapped_column(BigInteger, default=0)
+    assigned_rows: Mapped[int] = mapped_column(BigInteger, default=0)
+    elapsed_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class ReminderRun(Base):
+    __tablename__ = 'reminder_run'
+
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    last_user_id: Mapped[int] = mapped_column(Integer, default=0)
+    sent: Mapped[int] = mapped_column(BigInteger, default=0)
+    elapsed_ms: Mapped[int] = mapped_column(BigInteger, default=0)
+    started_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime, nullable=True)
+
+
+class FriendSuggestion(Base):
+    __tablename__ = 'friend_suggestion'
+
+    user_id: Mapped[int] = mapped_column(ForeignKey('profile.id', ondelete='CASCADE'), primary_key=True)
+    # [[candidate_id, score, mutual_count], ...] best first
+    candidates: Mapped[list] = mapped_column(JSON)
+    computed_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+
+class SuggestionQueue(Base):
+    """Users whose followees, country or languages changed since suggestions were last computed.
+
+    Filled by triggers on ``follow``, ``language_progress`` and ``profile``; no
+    foreign key, so deleting a profile never trips over its own queue row.
+    """
+    __tablename__ = 'suggestion_queue'
+
+    user_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
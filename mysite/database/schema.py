@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
 from datetime import date, datetime
 from .models import RoleChoices, LevelChoices, TypeChoices
@@ -93,6 +93,8 @@ class UserProfileDetailSchema(BaseModel):
     first_name: str
     last_name: str
     username: str
+    followers_count: int
+    following_count: int
 
     streak: int
     levels: List[LanguageProgressOutSchema]
@@ -113,6 +115,23 @@ class FollowOutSchema(BaseModel):
     follower_id: int
 
 
+class FollowUserSchema(BaseModel):
+    id: int
+    username: str
+    avatar: Optional[str]
+
+
+class FollowStatusSchema(BaseModel):
+    follower_id: int
+    following_id: int
+    follows: bool
+
+
+class FriendSuggestionSchema(FollowUserSchema):
+    mutual_count: int
+    score: float
+
+
 class SuperFollowInputSchema(BaseModel):
     title: str
     description: str
@@ -218,6 +237,15 @@ class OptionOutSchema(BaseModel):
     exercise_id: int
 
 
+class ExerciseBundleSchema(ExerciseOutSchema):
+    options: List[OptionOutSchema]
+
+
+class LessonBundleSchema(LessonOutSchema):
+    next_lesson_id: Optional[int]
+    exercises: List[ExerciseBundleSchema]
+
+
 class UserProgressInputSchema(BaseModel):
     user_id: int
     lesson_id: int
@@ -344,6 +372,60 @@ class CompleteLessonResponseSchema(BaseModel):
         from_attributes = True
 
 
+class LessonCompletionBatchItemSchema(BaseModel):
+    lesson_id: int
+    completed_at: datetime
+    idempotency_key: str = Field(min_length=1, max_length=64)
+
+
+class LessonCompletionBatchInputSchema(BaseModel):
+    items: List[LessonCompletionBatchItemSchema] = Field(max_length=500)
+
+
+class LessonCompletionBatchResultSchema(BaseModel):
+    idempotency_key: str
+    lesson_id: int
+    status: str
+    completion_id: Optional[int] = None
+
+
+class LessonCompletionBatchResponseSchema(BaseModel):
+    results: List[LessonCompletionBatchResultSchema]
+    levels: List[LanguageProgressOutSchema]
+    streak: int
+
+
+class CourseProgressOutSchema(BaseModel):
+    course_id: int
+    completed_order: int
+
+
+class LeaderboardEntrySchema(BaseModel):
+    rank: int
+    user_id: int
+    username: str
+    avatar: Optional[str]
+    xp: int
+
+
+class LeagueStandingSchema(BaseModel):
+    position: int
+    user_id: int
+    username: str
+    avatar: Optional[str]
+    xp: int
+
+
+class LeagueCohortSchema(BaseModel):
+    week: date
+    tier: int
+    name: str
+    cohort: int
+    promote_count: int
+    demote_count: int
+    standings: List[LeagueStandingSchema]
+
+
 class AchievementInputSchema(BaseModel):
     lesson_level_id: int
 
@@ -0,0 +1,66 @@
+from typing import Any, Hashable, Optional
+from sqlalchemy import select
+from Duolingo.mysite.database.db import AsyncSessionLocal
+from Duolingo.mysite.database.models import CatalogVersion
+from Duolingo.mysite.services.cache import TTLCache
+from Duolingo.mysite.config import CATALOG_CACHE_SIZE, CATALOG_CACHE_TTL
+
+# Deleting a parent cascades to its children, so invalidating it must drop theirs too.
+CATALOG_DEPENDENTS = {
+    'language': ('course', 'lesson', 'exercise', 'option', 'bundle', 'pack'),
+    'course': ('lesson', 'exercise', 'option', 'bundle', 'pack'),
+    'lesson': ('exercise', 'option', 'bundle', 'pack'),
+    'exercise': ('option', 'bundle', 'pack'),
+    'option': ('bundle', 'pack'),
+    'bundle': (),
+    'pack': (),
+    'country': (),
+}
+
+
+class CatalogCache:
+    """Read-through cache for catalog endpoints.
+
+    Entries are keyed by the entity's local generation; invalidating an entity
+    bumps the generation, so stale entries become unreachable and simply age
+    out of the LRU. Other workers learn about writes through the per-table
+    counters in ``catalog_version``, which Postgres triggers bump on every
+    statement that touches a catalog table.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations = dict.fromkeys(CATALOG_DEPENDENTS, 0)
+        self._versions: dict[str, int] = {}
+
+    def generation(self, entity: str) -> int:
+        return self._generations[entity]
+
+    def get(self, entity: str, key: Hashable) -> Optional[Any]:
+        return self._entries.get((entity, self._generations[entity], key))
+
+    def set(self, entity: str, generation: int, key: Hashable, value: Any) -> None:
+        if generation == self._generations[entity]:
+            self._entries.set((entity, generation, key), value)
+
+    def invalidate(self, entity: str) -> None:
+        for name in (entity, *CATALOG_DEPENDENTS[entity]):
+            self._generations[name] += 1
+
+    def observe(self, versions: dict[str, int]) -> None:
+        for entity, version in versions.items():
+            if entity in self._generations and self._versions.get(entity) != version:
+                self._versions[entity] = version
+                self.invalidate(entity)
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), 'versions': dict(self._versions)}
+
+
+catalog_cache = CatalogCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+
+
+async def refresh_catalog_versions() -> None:
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(select(CatalogVersion.name, CatalogVersion.version))).all()
+    catalog_cache.observe(dict(rows))
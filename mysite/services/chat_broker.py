@@ -0,0 +1,230 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+from sqlalchemy import select, func, event
+from sqlalchemy.ext.asyncio import AsyncSession
+from Duolingo.mysite.database.db import async_engine, AsyncSessionLocal
+from Duolingo.mysite.database.models import Message
+from Duolingo.mysite.database.schema import MessageOutShema
+from Duolingo.mysite.config import (CHAT_BROKER_BACKEND, CHAT_NOTIFY_CHANNEL, CHAT_SEND_QUEUE_SIZE,
+                                    CHAT_LISTEN_RETRY_DELAY)
+
+logger = logging.getLogger(__name__)
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more.
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+def message_payload(message: Message) -> str:
+    return MessageOutShema.model_validate(message, from_attributes=True).model_dump_json()
+
+
+class ChatSubscription:
+    """Bounded send queue of one WebSocket connection.
+
+    A connection that falls ``maxsize`` messages behind is cut off rather than
+    buffered without limit or silently skipped: its queue is emptied and
+    ``get`` returns None, after which the client reconnects with ``after`` set
+    to the last id it saw and the endpoint replays the gap from the table.
+    """
+
+    def __init__(self, chat_id: int, maxsize: int):
+        self.chat_id = chat_id
+        self.overflowed = False
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+    def offer(self, message_id: int, payload: str) -> bool:
+        if self.overflowed:
+            return False
+        try:
+            self._queue.put_nowait((message_id, payload))
+        except asyncio.QueueFull:
+            self.cut_off()
+            return False
+        return True
+
+    def cut_off(self) -> None:
+        self.overflowed = True
+        while not self._queue.empty():
+            self._queue.get_nowait()
+        self._queue.put_nowait(None)
+
+    async def get(self) -> Optional[tuple[int, str]]:
+        return await self._queue.get()
+
+
+class ChatBackend(ABC):
+    """Carries published messages to the broker of every worker.
+
+    ``publish`` runs inside the transaction that inserts the message, and
+    nothing reaches subscribers unless that transaction commits.
+    """
+
+    def start(self, broker: 'ChatBroker') -> None:
+        self.broker = broker
+
+    async def stop(self) -> None:
+        pass
+
+    @abstractmethod
+    async def publish(self, db: AsyncSession, chat_id: int, message_id: int, payload: str) -> None:
+        ...
+
+
+class LocalChatBackend(ChatBackend):
+    """Single-process stand-in that hands messages to the local broker once the session commits."""
+
+    async def publish(self, db: AsyncSession, chat_id: int, message_id: int, payload: str) -> None:
+        def deliver(session) -> None:
+            self.broker.deliver(chat_id, message_id, payload)
+
+        event.listen(db.sync_session, 'after_commit', deliver, once=True)
+
+
+class PostgresChatBackend(ChatBackend):
+    """Fans messages out across workers with LISTEN/NOTIFY.
+
+    Each worker keeps one listening connection and the publishing worker gets
+    its own notification like everybody else. The NOTIFY is issued on the
+    inserting transaction's own connection, so Postgres delivers it exactly
+    when the message commits. Messages too large for a NOTIFY payload are
+    sent as ids only and loaded from the table by each receiver.
+    When the listening connection drops, every local subscriber is cut off so
+    that clients reconnect and replay whatever was missed.
+    """
+
+    def __init__(self, channel: str, retry_delay: float):
+        self.channel = channel
+        self.retry_delay = retry_delay
+        self._task: Optional[asyncio.Task] = None
+        self._loads: set[asyncio.Task] = set()
+
+    def start(self, broker: 'ChatBroker') -> None:
+        super().start(broker)
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen(), name='chat_listen')
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._loads):
+            task.cancel()
+        await asyncio.gather(*self._loads, return_exceptions=True)
+
+    async def publish(self, db: AsyncSession, chat_id: int, message_id: int, payload: str) -> None:
+        data = f'{chat_id}:{message_id}:{payload}'
+        if len(data.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            data = f'{chat_id}:{message_id}:'
+        await db.execute(select(func.pg_notify(self.channel, data)))
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with async_engine.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection
+                    lost = asyncio.Event()
+
+                    def on_lost(connection) -> None:
+                        lost.set()
+
+                    raw.add_termination_listener(on_lost)
+                    await raw.add_listener(self.channel, self._on_notify)
+                    try:
+                        await lost.wait()
+                    finally:
+                        # Pooled connections must not keep listening after they are handed back.
+                        raw.remove_termination_listener(on_lost)
+                        if not raw.is_closed():
+                            await raw.remove_listener(self.channel, self._on_notify)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Chat listener on %s failed', self.channel)
+            self.broker.reset()
+            await asyncio.sleep(self.retry_delay)
+
+    def _on_notify(self, connection, pid: int, channel: str, data: str) -> None:
+        chat_id, message_id, payload = data.split(':', 2)
+        if payload:
+            self.broker.deliver(int(chat_id), int(message_id), payload)
+        else:
+            # The loop keeps only weak references to tasks; hold them until they finish.
+            task = asyncio.create_task(self._deliver_stored(int(chat_id), int(message_id)))
+            self._loads.add(task)
+            task.add_done_callback(self._loads.discard)
+
+    async def _deliver_stored(self, chat_id: int, message_id: int) -> None:
+        async with AsyncSessionLocal() as db:
+            message = await db.get(Message, message_id)
+        if message is not None:
+            self.broker.deliver(chat_id, message_id, message_payload(message))
+
+
+class ChatBroker:
+    """Routes new messages to the WebSocket connections subscribed to their chat.
+
+    A message is serialized once and the same text frame is queued for every
+    subscriber.
+    """
+
+    def __init__(self, backend: ChatBackend, queue_size: int):
+        self.backend = backend
+        self.queue_size = queue_size
+        self.published = 0
+        self.delivered = 0
+        self.cut_off = 0
+        self._subscribers: dict[int, set[ChatSubscription]] = {}
+
+    def start(self) -> None:
+        self.backend.start(self)
+
+    async def stop(self) -> None:
+        await self.backend.stop()
+
+    def subscribe(self, chat_id: int) -> ChatSubscription:
+        subscription = ChatSubscription(chat_id, self.queue_size)
+        self._subscribers.setdefault(chat_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ChatSubscription) -> None:
+        subscribers = self._subscribers.get(subscription.chat_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.chat_id]
+        if subscription.overflowed:
+            self.cut_off += 1
+
+    async def publish(self, db: AsyncSession, message: Message) -> None:
+        """Queues ``message`` for fan-out when ``db`` commits; call it after flush, before commit."""
+        await self.backend.publish(db, message.chat_id, message.id, message_payload(message))
+        self.published += 1
+
+    def deliver(self, chat_id: int, message_id: int, payload: str) -> None:
+        for subscription in self._subscribers.get(chat_id, ()):
+            if subscription.offer(message_id, payload):
+                self.delivered += 1
+
+    def reset(self) -> None:
+        for subscribers in self._subscribers.values():
+            for subscription in subscribers:
+                if not subscription.overflowed:
+                    subscription.cut_off()
+
+    def stats(self) -> dict:
+        return {'chats': len(self._subscribers), 'connections': sum(map(len, self._subscribers.values())),
+                'published': self.published, 'delivered': self.delivered, 'cut_off': self.cut_off}
+
+
+if CHAT_BROKER_BACKEND == 'postgres':
+    chat_backend: ChatBackend = PostgresChatBackend(CHAT_NOTIFY_CHANNEL, CHAT_LISTEN_RETRY_DELAY)
+else:
+    chat_backend = LocalChatBackend()
+
+chat_broker = ChatBroker(chat_backend, CHAT_SEND_QUEUE_SIZE)
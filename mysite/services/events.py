@@ -0,0 +1,236 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import DateTime, insert
+from sqlalchemy.exc import IntegrityError
+from Duolingo.mysite.database.db import AsyncSessionLocal
+from Duolingo.mysite.database.models import XPHistory, ActivityEvent
+from Duolingo.mysite.config import EVENT_FLUSH_SIZE, EVENT_FLUSH_INTERVAL_MS, EVENT_MAX_PENDING, EVENT_SPOOL_DIR
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locks, each process only replays its own spool
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+REPLAY_RETRY_DELAY = 5
+
+
+class WriteBehindBuffer:
+    """Collects rows in memory and writes them with multi-row inserts off the request path.
+
+    A flush runs every ``interval`` seconds or as soon as ``batch_size`` rows
+    are waiting. Memory is bounded by ``max_pending``: rows beyond it, and
+    batches the database refuses, are appended to a JSONL spool file of this
+    process that is replayed once inserts succeed again. Replay progress is
+    checkpointed after every batch, and spools left behind by processes that
+    have exited are adopted by whichever live process locks them first.
+    """
+
+    def __init__(self, model, batch_size: int, interval: float, max_pending: int, spool_dir: str):
+        self.table = model.__table__
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self.spool_dir = spool_dir
+        self.spool_path = self._spool_file(os.getpid())
+        self.flushed = 0
+        self.spooled = 0
+        self._rows: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self._lock = None
+        self._replay_after = 0.0
+        self._datetime_columns = {column.name for column in self.table.columns if isinstance(column.type, DateTime)}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _spool_file(self, owner) -> str:
+        return os.path.join(self.spool_dir, f'{self.table.name}.{owner}.jsonl')
+
+    def emit(self, **row) -> None:
+        if len(self._rows) >= self.max_pending:
+            self._spool([row])
+            return
+
+        self._rows.append(row)
+        if len(self._rows) >= self.batch_size:
+            self._wakeup.set()
+
+    async def flush(self) -> None:
+        while self._rows:
+            batch = [self._rows.popleft() for _ in range(min(self.batch_size, len(self._rows)))]
+            try:
+                inserted = await self._insert(batch)
+            except asyncio.CancelledError:
+                self._rows.extendleft(reversed(batch))
+                raise
+            if not inserted:
+                self._spool(batch)
+                return
+        await self._replay_spool()
+
+    async def _insert(self, rows: list) -> bool:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(self.table), rows)
+                await db.commit()
+        except IntegrityError:
+            # One bad row (e.g. its user was deleted meanwhile) must not sink the whole batch.
+            if len(rows) > 1:
+                failed = [row for row in rows if not await self._insert([row])]
+                if failed:
+                    self._spool(failed)
+                return True
+            logger.warning('Dropped %s row rejected by the database: %s', self.table.name, rows[0])
+            return True
+        except Exception:
+            logger.exception('Failed to flush %s %s rows', len(rows), self.table.name)
+            return False
+
+        self.flushed += len(rows)
+        return True
+
+    def _spool(self, rows: list) -> None:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with open(self.spool_path, 'a', encoding='utf-8') as f:
+            for row in rows:
+                f.write(json.dumps(row, default=datetime.isoformat, ensure_ascii=False) + '\n')
+        self.spooled += len(rows)
+
+    def _decode(self, line: str) -> dict:
+        row = json.loads(line)
+        for name in self._datetime_columns & row.keys():
+            row[name] = datetime.fromisoformat(row[name])
+        return row
+
+    async def _replay_spool(self) -> None:
+        if time.monotonic() < self._replay_after:
+            return
+
+        if not await self._replay_files(self.spool_path):
+            return
+        for spool_path, lock in self._orphaned_spools():
+            try:
+                if not await self._replay_files(spool_path):
+                    return
+                os.remove(lock.name)
+            finally:
+                lock.close()
+
+    async def _replay_files(self, spool_path: str) -> bool:
+        replay_path = spool_path + '.replay'
+        offset_path = replay_path + '.offset'
+        while True:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(spool_path):
+                    return True
+                os.replace(spool_path, replay_path)
+
+            with open(replay_path, encoding='utf-8') as f:
+                rows = [self._decode(line) for line in f if line.strip()]
+            try:
+                with open(offset_path, encoding='utf-8') as f:
+                    done = int(f.read())
+            except (FileNotFoundError, ValueError):
+                done = 0
+
+            for start in range(done, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                if not await self._insert(batch):
+                    self._replay_after = time.monotonic() + REPLAY_RETRY_DELAY
+                    return False
+                # Checkpoint so a later retry never inserts these rows again.
+                write_atomic(offset_path, str(start + len(batch)))
+
+            os.remove(replay_path)
+            if os.path.exists(offset_path):
+                os.remove(offset_path)
+            logger.info('Replayed %s spooled %s rows from %s', len(rows) - done, self.table.name, replay_path)
+
+    def _orphaned_spools(self):
+        """Yields (spool path, held lock) for spools whose owning process has exited."""
+        if fcntl is None or not os.path.isdir(self.spool_dir):
+            return
+        prefix = self.table.name + '.'
+        owners = {name[len(prefix):].split('.', 1)[0] for name in os.listdir(self.spool_dir)
+                  if name.startswith(prefix) and '.jsonl' in name}
+        owners.discard(str(os.getpid()))
+        for owner in sorted(owners):
+            spool_path = self._spool_file(owner)
+            lock = open(spool_path + '.lock', 'a')
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock.close()
+                continue
+            yield spool_path, lock
+
+    def _hold_spool_lock(self) -> None:
+        # Held for the life of the process; other processes treat our spool as orphaned once it is released.
+        if fcntl is None or self._lock is not None:
+            return
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._lock = open(self.spool_path + '.lock', 'a')
+        fcntl.flock(self._lock, fcntl.LOCK_EX)
+
+    async def _loop(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception('Write-behind flush of %s failed', self.table.name)
+
+    def start(self) -> None:
+        self._hold_spool_lock()
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._loop(), name=f'write_behind_{self.table.name}')
+
+    async def stop(self) -> None:
+        # Let the loop finish its current flush instead of cancelling a batch mid-insert.
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {'pending': len(self._rows), 'flushed': self.flushed, 'spooled': self.spooled}
+
+
+def write_atomic(path: str, data: str) -> None:
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+xp_history_buffer = WriteBehindBuffer(XPHistory, EVENT_FLUSH_SIZE, EVENT_FLUSH_INTERVAL_MS / 1000,
+                                      EVENT_MAX_PENDING, EVENT_SPOOL_DIR)
+activity_buffer = WriteBehindBuffer(ActivityEvent, EVENT_FLUSH_SIZE, EVENT_FLUSH_INTERVAL_MS / 1000,
+                                    EVENT_MAX_PENDING, EVENT_SPOOL_DIR)
+
+
+def record_xp(user_id: int, xp: int, reason: str) -> None:
+    xp_history_buffer.emit(user_id=user_id, xp=xp, reason=reason, created_date=datetime.utcnow())
+
+
+def record_activity(user_id: int, kind: str, **payload) -> None:
+    activity_buffer.emit(user_id=user_id, kind=kind, payload=payload or None, created_at=datetime.utcnow())
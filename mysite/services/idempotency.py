@@ -0,0 +1,100 @@
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, delete, update
+from sqlalchemy.dialects.postgresql import insert
+from Duolingo.mysite.database.db import AsyncSessionLocal
+from Duolingo.mysite.database.models import IdempotencyRecord
+from Duolingo.mysite.services.cache import TTLCache
+from Duolingo.mysite.config import (IDEMPOTENCY_TTL, IDEMPOTENCY_PENDING_TTL, IDEMPOTENCY_CACHE_SIZE,
+                                    IDEMPOTENCY_CACHE_TTL, IDEMPOTENCY_PURGE_BATCH)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    request_hash: str
+    status_code: Optional[int]
+    headers: list
+    body: bytes
+
+    @property
+    def pending(self) -> bool:
+        return self.status_code is None
+
+
+# key -> StoredResponse, only for finished requests
+idempotency_cache = TTLCache(maxsize=IDEMPOTENCY_CACHE_SIZE, ttl=IDEMPOTENCY_CACHE_TTL)
+
+
+async def reserve_idempotency_key(key: str, request_hash: str) -> Optional[StoredResponse]:
+    """Claims ``key`` for a new request; returns the existing record instead if someone already has it.
+
+    The pending row is committed before the handler runs, so a retry that lands
+    on another worker sees it. Expired rows, including pending ones left behind
+    by a crashed worker, are reclaimed by the same statement.
+    """
+    cached = idempotency_cache.get(key)
+    if cached is not None:
+        return cached
+
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        stmt = insert(IdempotencyRecord).values(key=key, request_hash=request_hash, created_at=now,
+                                                expires_at=now + timedelta(seconds=IDEMPOTENCY_PENDING_TTL))
+        reserved = await db.scalar(stmt.on_conflict_do_update(
+            index_elements=[IdempotencyRecord.key],
+            set_={'request_hash': stmt.excluded.request_hash, 'status_code': None, 'headers': None,
+                  'body': None, 'created_at': now, 'expires_at': stmt.excluded.expires_at},
+            where=IdempotencyRecord.expires_at < now).returning(IdempotencyRecord.key))
+        if reserved is not None:
+            await db.commit()
+            return None
+
+        record = (await db.execute(select(IdempotencyRecord.request_hash, IdempotencyRecord.status_code,
+                                          IdempotencyRecord.headers, IdempotencyRecord.body)
+                                   .where(IdempotencyRecord.key == key))).one()
+
+    stored = StoredResponse(record.request_hash, record.status_code, record.headers or [], record.body or b'')
+    if not stored.pending:
+        idempotency_cache.set(key, stored)
+    return stored
+
+
+async def complete_idempotency_key(key: str, stored: StoredResponse) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(update(IdempotencyRecord)
+                         .where(IdempotencyRecord.key == key)
+                         .values(status_code=stored.status_code, headers=stored.headers, body=stored.body,
+                                 expires_at=datetime.utcnow() + timedelta(seconds=IDEMPOTENCY_TTL)))
+        await db.commit()
+    idempotency_cache.set(key, stored)
+
+
+async def release_idempotency_key(key: str) -> None:
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(IdempotencyRecord)
+                         .where(IdempotencyRecord.key == key, IdempotencyRecord.status_code.is_(None)))
+        await db.commit()
+
+
+async def purge_expired_idempotency_keys(batch_size: int = IDEMPOTENCY_PURGE_BATCH) -> int:
+    now = datetime.utcnow()
+    purged = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            expired_keys = (select(IdempotencyRecord.key)
+                            .where(IdempotencyRecord.expires_at < now)
+                            .limit(batch_size)
+                            .scalar_subquery())
+            result = await db.execute(delete(IdempotencyRecord).where(IdempotencyRecord.key.in_(expired_keys)))
+            await db.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+    if purged:
+        logger.info('Purged %s expired idempotency keys', purged)
+    return purged
@@ -0,0 +1,50 @@
+from dataclasses import dataclass
+from typing import Optional
+from Duolingo.mysite.database.models import UserProfile, RoleChoices
+from Duolingo.mysite.services.cache import TTLCache
+from Duolingo.mysite.config import TOKEN_CACHE_SIZE, TOKEN_CACHE_TTL, USER_CACHE_SIZE, USER_CACHE_TTL
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    username: str
+    role: RoleChoices
+    is_active: bool
+    country_id: int
+
+    @classmethod
+    def from_profile(cls, user: UserProfile) -> 'CurrentUser':
+        return cls(id=user.id, username=user.username, role=user.role,
+                   is_active=user.is_active, country_id=user.country_id)
+
+
+# token -> (sub, user_id); entries never outlive the token's own exp claim
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+# user_id -> CurrentUser
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def get_cached_user(user_id: int) -> Optional[CurrentUser]:
+    return user_cache.get(user_id)
+
+
+def remember_user(user: CurrentUser) -> None:
+    user_cache.set(user.id, user)
+
+
+def forget_user(user_id: int) -> None:
+    user_cache.pop(user_id)
+
+
+def forget_token(token: str) -> None:
+    token_cache.pop(token)
+
+
+def forget_user_tokens(user_id: int) -> None:
+    # Logout is rare, so a scan beats keeping a second index in step with LRU eviction.
+    token_cache.pop_matching(lambda entry: entry[1] == user_id)
+
+
+def identity_cache_stats() -> dict:
+    return {'tokens': token_cache.stats(), 'users': user_cache.stats()}
@@ -0,0 +1,238 @@
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, update, func, case, and_, cast, String, literal, exists
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from Duolingo.mysite.database.db import async_engine
+from Duolingo.mysite.database.models import LeagueMembership, LeagueSeat, LeagueRun, LeagueResultChoices, UserProfile
+from Duolingo.mysite.services.cache import TTLCache
+from Duolingo.mysite.config import (LEAGUE_COHORT_SIZE, LEAGUE_PROMOTE_COUNT, LEAGUE_DEMOTE_COUNT,
+                                    LEAGUE_BATCH_COHORTS, LEAGUE_CACHE_SIZE, LEAGUE_CACHE_TTL)
+
+logger = logging.getLogger(__name__)
+
+LEAGUE_NAMES = ('Bronze', 'Silver', 'Gold', 'Sapphire', 'Ruby', 'Emerald', 'Amethyst', 'Pearl', 'Obsidian', 'Diamond')
+MAX_TIER = len(LEAGUE_NAMES) - 1
+LEAGUE_JOB_LOCK = 0x1EA6
+
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def tier_shift():
+    return case((LeagueMembership.result == LeagueResultChoices.promoted, 1),
+                (LeagueMembership.result == LeagueResultChoices.demoted, -1), else_=0)
+
+
+class CohortStandings:
+    """Cohort tables kept in memory; a cohort is ~30 rows, so re-sorting one on every XP gain is constant time."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, week: date, tier: int, cohort: int) -> Optional[list]:
+        return self._entries.get((week, tier, cohort))
+
+    def set(self, week: date, tier: int, cohort: int, rows: list) -> list:
+        standings = sorted(rows, key=lambda row: (-row['xp'], row['user_id']))
+        self._entries.set((week, tier, cohort), standings)
+        return standings
+
+    def record(self, week: date, tier: int, cohort: int, user_id: int, xp: int) -> None:
+        standings = self._entries.get((week, tier, cohort))
+        if standings is None:
+            return
+
+        for row in standings:
+            if row['user_id'] == user_id:
+                row['xp'] = xp
+                standings.sort(key=lambda row: (-row['xp'], row['user_id']))
+                return
+        # A newcomer needs their profile fields; reload the cohort on next read.
+        self._entries.pop((week, tier, cohort))
+
+
+cohort_standings = CohortStandings(LEAGUE_CACHE_SIZE, LEAGUE_CACHE_TTL)
+
+
+def league_xp_cte(user_id: int, xp: int, week: date):
+    """Upsert of the user's league row for ``week`` as a CTE returning ``tier, cohort, xp``.
+
+    On the first gain of the week the user takes the next seat of their tier
+    from ``league_seat``; the ON CONFLICT update on that row serializes
+    concurrent joiners, so a cohort never holds more than
+    ``LEAGUE_COHORT_SIZE`` users. Later gains only add to ``xp``.
+    """
+    # Returning users rejoin at the tier their last finished week earned them.
+    tier = func.coalesce(select(func.least(func.greatest(LeagueMembership.tier + tier_shift(), 0), MAX_TIER))
+                         .where(LeagueMembership.user_id == user_id, LeagueMembership.week < week)
+                         .order_by(LeagueMembership.week.desc()).limit(1)
+                         .scalar_subquery(), 0)
+
+    joining = ~exists().where(LeagueMembership.user_id == user_id, LeagueMembership.week == week)
+    seat_insert = insert(LeagueSeat).from_select(['week', 'tier', 'seats'],
+                                                 select(literal(week), tier, literal(1)).where(joining))
+    seat_cte = (seat_insert
+                .on_conflict_do_update(index_elements=['week', 'tier'], set_={'seats': LeagueSeat.seats + 1})
+                .returning((LeagueSeat.seats - 1).label('seat'))
+                .cte('league_seat_taken'))
+    cohort = func.coalesce(select(seat_cte.c.seat).scalar_subquery() // LEAGUE_COHORT_SIZE, 0)
+
+    stmt = insert(LeagueMembership).from_select(['user_id', 'week', 'tier', 'cohort', 'xp'],
+                                                select(literal(user_id), literal(week), tier, cohort, literal(xp)))
+    return (stmt.on_conflict_do_update(constraint='uq_league_user_week',
+                                       set_={'xp': LeagueMembership.xp + stmt.excluded.xp})
+            .returning(LeagueMembership.tier, LeagueMembership.cohort, LeagueMembership.xp)
+            .cte('league'))
+
+
+async def add_league_xp(db: AsyncSession, user_id: int, xp: int, day: Optional[date] = None):
+    """Adds XP to the user's league row for this week in one statement of the caller's transaction.
+
+    Returns ``(week, tier, cohort, xp)``.
+    """
+    week = week_start(day or date.today())
+    league = league_xp_cte(user_id, xp, week)
+    row = (await db.execute(select(league.c.tier, league.c.cohort, league.c.xp))).one()
+    return week, row.tier, row.cohort, row.xp
+
+
+async def load_cohort(db: AsyncSession, week: date, tier: int, cohort: int) -> list:
+    standings = cohort_standings.get(week, tier, cohort)
+    if standings is None:
+        rows = await db.execute(select(LeagueMembership.user_id, LeagueMembership.xp,
+                                       UserProfile.username, UserProfile.avatar)
+                                .join(UserProfile, UserProfile.id == LeagueMembership.user_id)
+                                .where(LeagueMembership.week == week, LeagueMembership.tier == tier,
+                                       LeagueMembership.cohort == cohort))
+        standings = cohort_standings.set(week, tier, cohort, [dict(row._mapping) for row in rows])
+    return standings
+
+
+def rank_cohorts_stmt(week: date, tier: int, low: int, high: int):
+    ranked = (select(LeagueMembership.id,
+                     func.row_number().over(partition_by=LeagueMembership.cohort,
+                                            order_by=(LeagueMembership.xp.desc(), LeagueMembership.user_id))
+                     .label('position'),
+                     func.count().over(partition_by=LeagueMembership.cohort).label('size'))
+              .where(LeagueMembership.week == week, LeagueMembership.tier == tier,
+                     LeagueMembership.cohort >= low, LeagueMembership.cohort < high)
+              .subquery())
+    result = case((and_(ranked.c.position <= LEAGUE_PROMOTE_COUNT, tier < MAX_TIER, LeagueMembership.xp > 0),
+                   LeagueResultChoices.promoted.name),
+                  (and_(ranked.c.position > ranked.c.size - LEAGUE_DEMOTE_COUNT, tier > 0),
+                   LeagueResultChoices.demoted.name),
+                  else_=LeagueResultChoices.stayed.name)
+    return (update(LeagueMembership)
+            .where(LeagueMembership.id == ranked.c.id)
+            .values(position=ranked.c.position, result=cast(result, LeagueMembership.result.type)))
+
+
+def moving_to_tier(week: date, tier: int) -> tuple:
+    """Conditions on ``week``'s rows of the users who play ``tier`` the week after."""
+    return (LeagueMembership.week == week, LeagueMembership.tier.between(tier - 1, tier + 1),
+            LeagueMembership.xp > 0, LeagueMembership.tier + tier_shift() == tier)
+
+
+def reserve_cohorts_stmt(week: date, tier: int, users: int):
+    """Reserves whole cohorts for ``users`` seeded users and returns the first reserved seat.
+
+    Users who earned XP before the job ran already hold seats, so the
+    reservation starts on the next fresh cohort after theirs.
+    """
+    seats = -(-users // LEAGUE_COHORT_SIZE) * LEAGUE_COHORT_SIZE
+    stmt = insert(LeagueSeat).values(week=week, tier=tier, seats=seats)
+    return (stmt.on_conflict_do_update(index_elements=['week', 'tier'],
+                                       set_={'seats': (LeagueSeat.seats + LEAGUE_COHORT_SIZE - 1)
+                                             // LEAGUE_COHORT_SIZE * LEAGUE_COHORT_SIZE + seats})
+            .returning(LeagueSeat.seats - seats))
+
+
+def assign_tier_stmt(week: date, tier: int, base: int):
+    next_week = week + timedelta(days=7)
+    shuffle = func.row_number().over(order_by=func.md5(cast(LeagueMembership.user_id, String) + str(next_week)))
+    source = (select(LeagueMembership.user_id, literal(next_week), literal(tier),
+                     base + (shuffle - 1) // LEAGUE_COHORT_SIZE, literal(0))
+              .where(*moving_to_tier(week, tier)))
+    stmt = insert(LeagueMembership).from_select(['user_id', 'week', 'tier', 'cohort', 'xp'], source)
+    return stmt.on_conflict_do_update(constraint='uq_league_user_week',
+                                      set_={'tier': stmt.excluded.tier, 'cohort': stmt.excluded.cohort})
+
+
+async def close_league_week(week: date) -> None:
+    """Ranks every cohort of ``week`` and seeds next week's cohorts from the results.
+
+    Both phases are set-based statements over bounded slices (a range of
+    cohorts, then one tier), each committed together with its checkpoint in
+    ``league_run``, so a crashed or interrupted run resumes where it stopped.
+    An advisory lock keeps other workers from running the job concurrently.
+    """
+    async with async_engine.connect() as conn:
+        if not await conn.scalar(select(func.pg_try_advisory_lock(LEAGUE_JOB_LOCK))):
+            return
+        try:
+            await conn.execute(insert(LeagueRun).values(week=week).on_conflict_do_nothing())
+            run = (await conn.execute(select(LeagueRun).where(LeagueRun.week == week))).one()
+            await conn.commit()
+            if run.phase == 'done':
+                return
+
+            phase, start_tier, start_cohort = run.phase, run.tier, run.cohort
+            phase_started = time.perf_counter()
+            rows_done = 0
+
+            async def checkpoint(started: float, **values) -> None:
+                values['elapsed_ms'] = LeagueRun.elapsed_ms + int((time.perf_counter() - started) * 1000)
+                await conn.execute(update(LeagueRun).where(LeagueRun.week == week).values(**values))
+                await conn.commit()
+
+            if phase == 'rank':
+                for tier in range(start_tier, MAX_TIER + 1):
+                    last_cohort = await conn.scalar(select(func.max(LeagueMembership.cohort))
+                                                    .where(LeagueMembership.week == week,
+                                                           LeagueMembership.tier == tier))
+                    low = start_cohort if tier == start_tier else 0
+                    while last_cohort is not None and low <= last_cohort:
+                        started = time.perf_counter()
+                        high = low + LEAGUE_BATCH_COHORTS
+                        ranked = (await conn.execute(rank_cohorts_stmt(week, tier, low, high))).rowcount
+                        await checkpoint(started, tier=tier, cohort=high,
+                                         ranked_rows=LeagueRun.ranked_rows + ranked)
+                        rows_done += ranked
+                        low = high
+
+                logger.info('League week %s: ranked %s rows in %.2fs', week, rows_done,
+                            time.perf_counter() - phase_started)
+                await checkpoint(time.perf_counter(), phase='assign', tier=0, cohort=0)
+                phase, start_tier = 'assign', 0
+                phase_started, rows_done = time.perf_counter(), 0
+
+            if phase == 'assign':
+                for tier in range(start_tier, MAX_TIER + 1):
+                    started = time.perf_counter()
+                    users = await conn.scalar(select(func.count()).where(*moving_to_tier(week, tier)))
+                    # Committed on its own so joiners of this tier wait on the seat row only
+                    # briefly; a rerun after a crash reserves again and leaves empty cohorts.
+                    first_seat = await conn.scalar(reserve_cohorts_stmt(week + timedelta(days=7), tier, users))
+                    await conn.commit()
+                    base = first_seat // LEAGUE_COHORT_SIZE
+                    assigned = (await conn.execute(assign_tier_stmt(week, tier, base))).rowcount
+                    await checkpoint(started, tier=tier + 1, assigned_rows=LeagueRun.assigned_rows + assigned)
+                    rows_done += assigned
+
+                logger.info('League week %s: assigned %s rows to next week in %.2fs', week, rows_done,
+                            time.perf_counter() - phase_started)
+                await checkpoint(time.perf_counter(), phase='done', finished_at=datetime.utcnow())
+        finally:
+            # An error leaves the transaction aborted; unlocking needs a usable one.
+            await conn.rollback()
+            await conn.execute(select(func.pg_advisory_unlock(LEAGUE_JOB_LOCK)))
+            await conn.commit()
+
+
+async def close_previous_league_week() -> None:
+    await close_league_week(week_start(date.today()) - timedelta(days=7))
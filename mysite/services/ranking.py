@@ -0,0 +1,229 @@
+import logging
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, func
+from Duolingo.mysite.database.db import AsyncSessionLocal
+from Duolingo.mysite.database.models import LanguageProgress
+from Duolingo.mysite.config import LEADERBOARD_SYNC_OVERLAP, LEADERBOARD_REBUILD_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+MAX_LEVELS = 32
+
+
+class _Node:
+    __slots__ = ('key', 'next', 'width')
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [0] * levels
+
+
+class IndexableSkipList:
+    """Sorted set of unique keys with O(log n) insert, remove, rank and access by index.
+
+    Every link stores how many positions it skips, so walking down the levels
+    while summing widths yields an element's index without touching the rest.
+    """
+
+    def __init__(self):
+        self.size = 0
+        self._tail = _Node((float('inf'),), 0)
+        self._head = _Node(None, MAX_LEVELS)
+        self._head.next = [self._tail] * MAX_LEVELS
+        self._head.width = [1] * MAX_LEVELS
+
+    def __len__(self) -> int:
+        return self.size
+
+    def insert(self, key) -> None:
+        chain = [None] * MAX_LEVELS
+        steps_at_level = [0] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = 1
+        while levels < MAX_LEVELS and random.random() < 0.5:
+            levels += 1
+
+        new_node = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev_node = chain[level]
+            new_node.next[level] = prev_node.next[level]
+            prev_node.next[level] = new_node
+            new_node.width[level] = prev_node.width[level] - steps
+            prev_node.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, MAX_LEVELS):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key) -> None:
+        chain = [None] * MAX_LEVELS
+        node = self._head
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        target = chain[0].next[0]
+        if target.key != key:
+            raise KeyError(key)
+
+        for level in range(len(target.next)):
+            prev_node = chain[level]
+            prev_node.width[level] += target.width[level] - 1
+            prev_node.next[level] = target.next[level]
+        for level in range(len(target.next), MAX_LEVELS):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        node = self._head
+        position = 0
+        for level in reversed(range(MAX_LEVELS)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def slice(self, start: int, count: int) -> list:
+        if start >= self.size or count <= 0:
+            return []
+
+        node = self._head
+        remaining = start + 1
+        for level in reversed(range(MAX_LEVELS)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+
+        keys = []
+        while node is not self._tail and len(keys) < count:
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+
+class Leaderboard:
+    """Users ranked by XP, highest first; ties go to the lower user id."""
+
+    def __init__(self):
+        self._scores: dict[int, int] = {}
+        self._ranking = IndexableSkipList()
+
+    def __len__(self) -> int:
+        return len(self._ranking)
+
+    def set(self, user_id: int, xp: int) -> None:
+        old = self._scores.get(user_id)
+        if old == xp:
+            return
+        if old is not None:
+            self._ranking.remove((-old, user_id))
+        self._ranking.insert((-xp, user_id))
+        self._scores[user_id] = xp
+
+    def remove(self, user_id: int) -> None:
+        old = self._scores.pop(user_id, None)
+        if old is not None:
+            self._ranking.remove((-old, user_id))
+
+    def score(self, user_id: int) -> Optional[int]:
+        return self._scores.get(user_id)
+
+    def rank(self, user_id: int) -> Optional[int]:
+        xp = self._scores.get(user_id)
+        if xp is None:
+            return None
+        return self._ranking.index((-xp, user_id)) + 1
+
+    def page(self, offset: int, limit: int) -> list[tuple[int, int, int]]:
+        return [(offset + i + 1, user_id, -negative_xp)
+                for i, (negative_xp, user_id) in enumerate(self._ranking.slice(offset, limit))]
+
+    def around(self, user_id: int, radius: int) -> list[tuple[int, int, int]]:
+        rank = self.rank(user_id)
+        if rank is None:
+            return []
+        offset = max(rank - 1 - radius, 0)
+        return self.page(offset, rank - offset + radius)
+
+
+class Leaderboards:
+    """One leaderboard per language plus an overall one over each user's summed XP."""
+
+    def __init__(self):
+        self.overall = Leaderboard()
+        self._languages: dict[int, Leaderboard] = defaultdict(Leaderboard)
+        self._user_xp: dict[int, dict[int, int]] = defaultdict(dict)
+
+    def board(self, language_id: Optional[int] = None) -> Leaderboard:
+        if language_id is None:
+            return self.overall
+        # Unknown languages get a throwaway empty board rather than a new entry.
+        return self._languages.get(language_id) or Leaderboard()
+
+    def set_progress(self, user_id: int, language_id: int, xp: int) -> None:
+        user_xp = self._user_xp[user_id]
+        user_xp[language_id] = xp
+        self._languages[language_id].set(user_id, xp)
+        self.overall.set(user_id, sum(user_xp.values()))
+
+    def remove_user(self, user_id: int) -> None:
+        for language_id in self._user_xp.pop(user_id, {}):
+            self._languages[language_id].remove(user_id)
+        self.overall.remove(user_id)
+
+    def replace(self, other: 'Leaderboards') -> None:
+        self.overall, self._languages, self._user_xp = other.overall, other._languages, other._user_xp
+
+
+leaderboards = Leaderboards()
+_synced_at: Optional[datetime] = None
+_built_at: Optional[float] = None
+
+
+async def sync_leaderboards() -> None:
+    """Rebuilds the leaderboards every ``LEADERBOARD_REBUILD_INTERVAL``, and in between
+    applies rows changed since the last run.
+
+    The incremental pass picks up XP written by other workers; re-reading a
+    short overlap window catches transactions that committed after their
+    updated_at was stamped. Deleted users and progress rows leave no trace to
+    sync from, so they drop out at the next rebuild (or at once on the worker
+    that deleted them).
+    """
+    global _synced_at, _built_at
+
+    rebuild = _synced_at is None or time.monotonic() - _built_at >= LEADERBOARD_REBUILD_INTERVAL
+    async with AsyncSessionLocal() as db:
+        now = await db.scalar(select(func.localtimestamp()))
+        query = select(LanguageProgress.user_id, LanguageProgress.language_id,
+                       LanguageProgress.total_experience_sql())
+        if not rebuild:
+            query = query.where(LanguageProgress.updated_at >= _synced_at - timedelta(seconds=LEADERBOARD_SYNC_OVERLAP))
+        rows = await db.stream(query.execution_options(yield_per=5000))
+
+        target = Leaderboards() if rebuild else leaderboards
+        count = 0
+        async for user_id, language_id, xp in rows:
+            target.set_progress(user_id, language_id, xp)
+            count += 1
+
+    if rebuild:
+        leaderboards.replace(target)
+        _built_at = time.monotonic()
+        logger.info('Built leaderboards from %s language progress rows', count)
+    _synced_at = now
@@ -0,0 +1,116 @@
+import logging
+from abc import ABC, abstractmethod
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+from sqlalchemy import select, update, func
+from sqlalchemy.dialects.postgresql import insert
+from Duolingo.mysite.database.db import async_engine
+from Duolingo.mysite.database.models import Streak, ReminderRun
+from Duolingo.mysite.config import STREAK_REMINDER_HOUR, STREAK_REMINDER_BATCH
+
+logger = logging.getLogger(__name__)
+
+REMINDER_JOB_LOCK = 0x57EA
+
+
+@dataclass(frozen=True)
+class StreakReminder:
+    user_id: int
+    streak: int
+    deadline: datetime
+
+
+class ReminderSink(ABC):
+    """Delivers reminder batches; subclass it for push or e-mail delivery."""
+
+    @abstractmethod
+    async def send(self, reminders: list[StreakReminder]) -> None:
+        ...
+
+
+class LoggingReminderSink(ReminderSink):
+    """Local stand-in that only logs and counts what would have been sent."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send(self, reminders: list[StreakReminder]) -> None:
+        self.sent += len(reminders)
+        logger.info('Would remind %s users (user_id %s..%s) before %s', len(reminders),
+                    reminders[0].user_id, reminders[-1].user_id, reminders[0].deadline)
+
+
+reminder_sink: ReminderSink = LoggingReminderSink()
+
+
+def set_reminder_sink(sink: ReminderSink) -> None:
+    global reminder_sink
+    reminder_sink = sink
+
+
+async def send_streak_reminders(day: date, sink: Optional[ReminderSink] = None,
+                                batch_size: int = STREAK_REMINDER_BATCH) -> int:
+    """Sends a reminder to every user whose streak ends at midnight after ``day``.
+
+    Those are the live streaks last extended the day before. The partial
+    streak index holds them as one contiguous (last_activity, user_id) range,
+    so each batch is an index-only keyset scan with no join to ``profile``.
+    Progress is checkpointed in ``reminder_run`` after every batch; a
+    restarted run continues after the last user it reached.
+    """
+    sink = sink or reminder_sink
+    deadline = datetime.combine(day + timedelta(days=1), datetime.min.time())
+    sent = 0
+    async with async_engine.connect() as conn:
+        if not await conn.scalar(select(func.pg_try_advisory_lock(REMINDER_JOB_LOCK))):
+            return 0
+        try:
+            await conn.execute(insert(ReminderRun).values(day=day).on_conflict_do_nothing())
+            run = (await conn.execute(select(ReminderRun).where(ReminderRun.day == day))).one()
+            await conn.commit()
+            if run.finished_at is not None:
+                return 0
+
+            after = run.last_user_id
+            started = time.perf_counter()
+            while True:
+                batch_started = time.perf_counter()
+                rows = (await conn.execute(select(Streak.user_id, Streak.current_streak)
+                                           .where(Streak.current_streak > 0,
+                                                  Streak.last_activity == day - timedelta(days=1),
+                                                  Streak.user_id > after)
+                                           .order_by(Streak.user_id)
+                                           .limit(batch_size))).all()
+                await conn.commit()
+
+                if rows:
+                    await sink.send([StreakReminder(row.user_id, row.current_streak, deadline) for row in rows])
+                    after = rows[-1].user_id
+                    sent += len(rows)
+
+                done = len(rows) < batch_size
+                elapsed_ms = int((time.perf_counter() - batch_started) * 1000)
+                await conn.execute(update(ReminderRun).where(ReminderRun.day == day)
+                                   .values(last_user_id=after, sent=ReminderRun.sent + len(rows),
+                                           elapsed_ms=ReminderRun.elapsed_ms + elapsed_ms,
+                                           finished_at=datetime.utcnow() if done else None))
+                await conn.commit()
+                if done:
+                    break
+        finally:
+            await conn.rollback()
+            await conn.execute(select(func.pg_advisory_unlock(REMINDER_JOB_LOCK)))
+            await conn.commit()
+
+    elapsed = time.perf_counter() - started
+    logger.info('Sent %s streak reminders for %s in %.2fs (%.0f/s)', sent, day, elapsed,
+                sent / elapsed if elapsed else 0)
+    return sent
+
+
+async def run_streak_reminders() -> None:
+    now = datetime.now()
+    if now.hour >= STREAK_REMINDER_HOUR:
+        await send_streak_reminders(now.date())
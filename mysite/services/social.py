@@ -0,0 +1,61 @@
+from array import array
+from bisect import bisect_left
+from typing import Optional
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+from Duolingo.mysite.database.models import Follow, UserProfile
+from Duolingo.mysite.services.cache import TTLCache
+from Duolingo.mysite.config import FOLLOW_CACHE_SIZE, FOLLOW_CACHE_TTL, FOLLOW_CACHE_MAX_DEGREE
+
+
+class FollowGraphCache:
+    """Sorted followee ids of recently queried users, packed into ``array('l')``.
+
+    Membership checks bisect the array. Users following more than
+    ``max_degree`` accounts are never cached and always go to the index.
+    Local writes drop the affected entry; writes on other workers become
+    visible once the entry's TTL runs out.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, max_degree: int):
+        self.max_degree = max_degree
+        self._following = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, user_id: int) -> Optional[array]:
+        return self._following.get(user_id)
+
+    def set(self, user_id: int, following_ids) -> array:
+        following = array('l', following_ids)
+        self._following.set(user_id, following)
+        return following
+
+    def forget(self, user_id: int) -> None:
+        self._following.pop(user_id)
+
+    def stats(self) -> dict:
+        return self._following.stats()
+
+
+follow_graph = FollowGraphCache(FOLLOW_CACHE_SIZE, FOLLOW_CACHE_TTL, FOLLOW_CACHE_MAX_DEGREE)
+
+
+async def load_following(db: AsyncSession, user_id: int) -> Optional[array]:
+    following = follow_graph.get(user_id)
+    if following is None:
+        count = await db.scalar(select(UserProfile.following_count).where(UserProfile.id == user_id))
+        if count is None or count > follow_graph.max_degree:
+            return None
+        following = follow_graph.set(user_id, await db.scalars(select(Follow.following_id)
+                                                               .where(Follow.follower_id == user_id)
+                                                               .order_by(Follow.following_id)))
+    return following
+
+
+async def is_following(db: AsyncSession, follower_id: int, following_id: int) -> bool:
+    following = await load_following(db, follower_id)
+    if following is None:
+        return await db.scalar(select(exists().where(Follow.follower_id == follower_id,
+                                                     Follow.following_id == following_id)))
+
+    i = bisect_left(following, following_id)
+    return i < len(following) and following[i] == following_id
@@ -0,0 +1,58 @@
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, update, func, any_
+from Duolingo.mysite.database.db import AsyncSessionLocal
+from Duolingo.mysite.database.models import Streak
+from Duolingo.mysite.config import STREAK_ROLLOVER_BATCH, STREAK_ROLLOVER_TIME_BUDGET
+
+logger = logging.getLogger(__name__)
+
+last_rollover: dict = {}
+
+
+def streak_day(moment: datetime) -> date:
+    """The streak day of a naive UTC timestamp: streaks follow the server's local calendar."""
+    return moment.replace(tzinfo=timezone.utc).astimezone().date()
+
+
+async def roll_over_streaks(batch_size: int = STREAK_ROLLOVER_BATCH,
+                            time_budget: float = STREAK_ROLLOVER_TIME_BUDGET) -> int:
+    """Resets every streak whose last activity is before yesterday.
+
+    Each batch is one short UPDATE over the oldest live rows in the partial
+    index on ``last_activity``; a reset row leaves that index, so no cursor is
+    needed and a run that hits ``time_budget`` simply continues next time.
+    SKIP LOCKED leaves rows of in-flight lesson completions to their own
+    upsert and lets several workers share the work.
+    """
+    cutoff = streak_day(datetime.utcnow()) - timedelta(days=1)
+    started = time.perf_counter()
+    reset = batches = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            lapsed_ids = (select(Streak.id)
+                          .where(Streak.current_streak > 0, Streak.last_activity < cutoff)
+                          .order_by(Streak.last_activity)
+                          .limit(batch_size)
+                          .with_for_update(skip_locked=True)
+                          .scalar_subquery())
+            # ARRAY(...) runs the subquery once up front, so the update probes the
+            # primary key instead of hash-joining against the whole table.
+            result = await db.execute(update(Streak)
+                                      .where(Streak.id == any_(func.array(lapsed_ids)))
+                                      .values(current_streak=0))
+            await db.commit()
+            reset += result.rowcount
+            batches += 1
+            if result.rowcount < batch_size or time.perf_counter() - started >= time_budget:
+                break
+
+    elapsed = time.perf_counter() - started
+    last_rollover.update(cutoff=cutoff, reset=reset, batches=batches, seconds=round(elapsed, 3),
+                         rows_per_second=round(reset / elapsed) if elapsed else 0,
+                         complete=result.rowcount < batch_size)
+    if reset:
+        logger.info('Reset %s lapsed streaks in %s batches, %.2fs (%.0f rows/s)',
+                    reset, batches, elapsed, reset / elapsed)
+    return reset
@@ -0,0 +1,160 @@
+import logging
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func, case, cast, true, any_, all_, bindparam, Integer, Numeric, JSON
+from sqlalchemy.dialects.postgresql import insert, aggregate_order_by, ARRAY
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from Duolingo.mysite.database.db import async_engine
+from Duolingo.mysite.database.models import (UserProfile, Follow, LanguageProgress, FriendSuggestion,
+                                             SuggestionQueue)
+from Duolingo.mysite.services.cache import TTLCache
+from Duolingo.mysite.config import (SUGGESTION_TOP_K, SUGGESTION_FANOUT_CAP, SUGGESTION_MAX_AGE,
+                                    SUGGESTION_WEIGHT_MUTUAL, SUGGESTION_WEIGHT_COUNTRY,
+                                    SUGGESTION_WEIGHT_LANGUAGE, SUGGESTION_BATCH,
+                                    SUGGESTION_CACHE_SIZE, SUGGESTION_CACHE_TTL)
+
+logger = logging.getLogger(__name__)
+
+SUGGESTION_JOB_LOCK = 0x5066
+
+last_refresh: dict = {}
+
+
+def refresh_stmt(user_ids: list[int], computed_at: datetime):
+    """Ranks friends-of-friends for ``user_ids`` and upserts their ``friend_suggestion`` rows.
+
+    Candidates are the followees of the user's followees (at most
+    ``SUGGESTION_FANOUT_CAP`` per followee, lowest ids first) that the user
+    does not follow yet. Rows are ``[candidate_id, score, mutual_count]``,
+    best first; users left without candidates get an empty list.
+    """
+    # Followees and languages as arrays, so excluding candidates and counting
+    # shared languages are per-row checks instead of joins.
+    followees = func.array(select(Follow.following_id).where(Follow.follower_id == UserProfile.id)
+                           .scalar_subquery())
+    languages = func.array(select(LanguageProgress.language_id).where(LanguageProgress.user_id == UserProfile.id)
+                           .scalar_subquery())
+    users = (select(UserProfile.id.label('user_id'), UserProfile.country_id, followees.label('followees'),
+                    languages.label('languages'))
+             .where(UserProfile.id == any_(bindparam('user_ids', user_ids, type_=ARRAY(Integer))))
+             .cte('users'))
+    friend, reach = aliased(Follow), aliased(Follow)
+    reached = (select(reach.following_id)
+               .where(reach.follower_id == friend.following_id)
+               .order_by(reach.following_id).limit(SUGGESTION_FANOUT_CAP)
+               .lateral('reached'))
+    mutual = (select(users.c.user_id, users.c.country_id, users.c.languages,
+                     reached.c.following_id.label('candidate_id'), func.count().label('mutual'))
+              .select_from(users.join(friend, friend.follower_id == users.c.user_id).join(reached, true()))
+              .where(reached.c.following_id != users.c.user_id,
+                     reached.c.following_id != all_(users.c.followees))
+              .group_by(users.c.user_id, users.c.country_id, users.c.languages, reached.c.following_id)
+              .cte('mutual'))
+
+    candidate = aliased(UserProfile)
+    shared_languages = (select(func.count())
+                        .where(LanguageProgress.user_id == mutual.c.candidate_id,
+                               LanguageProgress.language_id == any_(mutual.c.languages))
+                        .scalar_subquery())
+    score = (SUGGESTION_WEIGHT_MUTUAL * mutual.c.mutual
+             + case((candidate.country_id == mutual.c.country_id, SUGGESTION_WEIGHT_COUNTRY), else_=0)
+             + SUGGESTION_WEIGHT_LANGUAGE * shared_languages)
+    scored = (select(mutual.c.user_id, mutual.c.candidate_id, mutual.c.mutual,
+                     func.round(cast(score, Numeric), 3).label('score'))
+              .join(candidate, candidate.id == mutual.c.candidate_id)
+              .subquery())
+    ranked = (select(scored, func.row_number().over(partition_by=scored.c.user_id,
+                                                   order_by=(scored.c.score.desc(), scored.c.mutual.desc(),
+                                                             scored.c.candidate_id)).label('rank'))
+              .subquery())
+    best = (select(ranked.c.user_id,
+                   func.json_agg(aggregate_order_by(func.json_build_array(ranked.c.candidate_id, ranked.c.score,
+                                                                          ranked.c.mutual),
+                                                    ranked.c.rank)).label('candidates'))
+            .where(ranked.c.rank <= SUGGESTION_TOP_K)
+            .group_by(ranked.c.user_id)
+            .cte('best'))
+
+    source = (select(users.c.user_id, func.coalesce(best.c.candidates, cast('[]', JSON)),
+                     bindparam('computed_at', computed_at))
+              .select_from(users.outerjoin(best, best.c.user_id == users.c.user_id)))
+    stmt = insert(FriendSuggestion).from_select(['user_id', 'candidates', 'computed_at'], source)
+    return stmt.on_conflict_do_update(index_elements=[FriendSuggestion.user_id],
+                                      set_={'candidates': stmt.excluded.candidates,
+                                            'computed_at': stmt.excluded.computed_at})
+
+
+async def refresh_suggestions(batch_size: int = SUGGESTION_BATCH) -> int:
+    """Recomputes stored friend suggestions of users whose inputs changed.
+
+    Triggers queue every user whose followees, country or languages changed.
+    A run takes the whole queue, then ranks each queued user and each of
+    their followers (whose candidates include the queued user's followees)
+    once, with set-based statements inside Postgres committed per batch. If
+    the run fails the taken users are queued again. Rows older than
+    ``SUGGESTION_MAX_AGE`` are refreshed afterwards, which also picks up
+    attribute changes of candidates two hops away and repairs anything lost
+    to a killed process.
+    """
+    started = time.perf_counter()
+    refreshed = 0
+    async with async_engine.connect() as conn:
+        if not await conn.scalar(select(func.pg_try_advisory_lock(SUGGESTION_JOB_LOCK))):
+            return 0
+        await conn.commit()
+        try:
+            queued = (await conn.scalars(delete(SuggestionQueue).returning(SuggestionQueue.user_id))).all()
+            await conn.commit()
+            try:
+                followers = (await conn.scalars(select(Follow.follower_id.distinct())
+                                                .where(Follow.following_id == any_(
+                                                    bindparam('user_ids', queued, type_=ARRAY(Integer)))))).all()
+                affected = sorted(set(queued).union(followers))
+                for start in range(0, len(affected), batch_size):
+                    batch = affected[start:start + batch_size]
+                    await conn.execute(refresh_stmt(batch, datetime.utcnow()))
+                    await conn.commit()
+                    refreshed += len(batch)
+            except BaseException:
+                await conn.rollback()
+                if queued:
+                    await conn.execute(insert(SuggestionQueue).values([{'user_id': user_id} for user_id in queued])
+                                       .on_conflict_do_nothing())
+                    await conn.commit()
+                raise
+
+            cutoff = datetime.utcnow() - timedelta(seconds=SUGGESTION_MAX_AGE)
+            while True:
+                user_ids = (await conn.scalars(select(FriendSuggestion.user_id)
+                                               .where(FriendSuggestion.computed_at < cutoff)
+                                               .order_by(FriendSuggestion.computed_at)
+                                               .limit(batch_size))).all()
+                if not user_ids:
+                    break
+                await conn.execute(refresh_stmt(user_ids, datetime.utcnow()))
+                await conn.commit()
+                refreshed += len(user_ids)
+        finally:
+            await conn.rollback()
+            await conn.execute(select(func.pg_advisory_unlock(SUGGESTION_JOB_LOCK)))
+            await conn.commit()
+
+    elapsed = time.perf_counter() - started
+    last_refresh.update(queued=len(queued), refreshed=refreshed, seconds=round(elapsed, 3))
+    if refreshed:
+        logger.info('Refreshed friend suggestions for %s users (%s queued) in %.2fs',
+                    refreshed, len(queued), elapsed)
+    return refreshed
+
+
+suggestion_cache = TTLCache(maxsize=SUGGESTION_CACHE_SIZE, ttl=SUGGESTION_CACHE_TTL)
+
+
+async def load_suggestions(db: AsyncSession, user_id: int) -> list:
+    candidates = suggestion_cache.get(user_id)
+    if candidates is None:
+        candidates = await db.scalar(select(FriendSuggestion.candidates)
+                                     .where(FriendSuggestion.user_id == user_id)) or []
+        suggestion_cache.set(user_id, candidates)
+    return candidates
@@ -0,0 +1,35 @@
+import hashlib
+import logging
+from datetime import datetime
+from sqlalchemy import select, delete
+from Duolingo.mysite.database.db import AsyncSessionLocal
+from Duolingo.mysite.database.models import RefreshToken
+from Duolingo.mysite.config import REFRESH_TOKEN_PURGE_BATCH
+
+logger = logging.getLogger(__name__)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+async def purge_expired_refresh_tokens(batch_size: int = REFRESH_TOKEN_PURGE_BATCH) -> int:
+    # Deletes in short id-bounded batches so the purge never holds long locks
+    # on refresh_token while logins keep inserting into it.
+    now = datetime.utcnow()
+    purged = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            expired_ids = (select(RefreshToken.id)
+                           .where(RefreshToken.expires_at < now)
+                           .limit(batch_size)
+                           .scalar_subquery())
+            result = await db.execute(delete(RefreshToken).where(RefreshToken.id.in_(expired_ids)))
+            await db.commit()
+            purged += result.rowcount
+            if result.rowcount < batch_size:
+                break
+
+    if purged:
+        logger.info('Purged %s expired refresh tokens', purged)
+    return purged